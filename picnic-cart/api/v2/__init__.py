@@ -2,6 +2,8 @@
 
 from flask import Blueprint
 
+from services.http_cache import compress_response
+
 from .auth import auth_bp
 from .cart import cart_bp
 from .products import products_bp
@@ -23,3 +25,6 @@ api_v2.register_blueprint(lists_bp)
 api_v2.register_blueprint(recipes_bp)
 api_v2.register_blueprint(analytics_bp)
 api_v2.register_blueprint(settings_bp)
+
+# Compress large JSON payloads for clients that accept gzip
+api_v2.after_request(compress_response)
@@ -2,11 +2,13 @@
 
 import logging
 from flask import Blueprint, request, jsonify
-from datetime import datetime, timedelta
 
 from services.auth import require_auth, get_current_user
+from services.http_cache import conditional, cacheable
 from services.db import get_db
-from services.analytics import get_analytics_service
+from services.analytics import (
+    get_analytics_service, FREQUENCY_CACHE_TTL, SUGGESTIONS_CACHE_TTL
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,34 +17,17 @@ analytics_bp = Blueprint('analytics', __name__, url_prefix='/analytics')
 
 @analytics_bp.route('/frequency', methods=['GET'])
 @require_auth
+@cacheable(ttl=FREQUENCY_CACHE_TTL)
+@conditional
 def get_frequency():
     """Get purchase frequency analysis."""
     user = get_current_user()
     min_purchases = request.args.get('min_purchases', 3, type=int)
 
     try:
-        db = get_db()
-        products = db.get_purchase_frequency(user['id'], min_purchases)
-
-        # Convert to serializable format
-        result = []
-        for p in (products or []):
-            result.append({
-                'product_id': p.get('picnic_product_id'),
-                'product_name': p.get('product_name'),
-                'total_purchases': p.get('total_purchases'),
-                'total_quantity': p.get('total_quantity'),
-                'first_purchased': p.get('first_purchased').isoformat() if p.get('first_purchased') else None,
-                'last_purchased': p.get('last_purchased').isoformat() if p.get('last_purchased') else None,
-                'avg_days_between': float(p.get('avg_days_between', 0)),
-                'confidence': float(p.get('confidence_score', 0)),
-                'suggested_frequency': p.get('suggested_frequency')
-            })
-
-        return jsonify({
-            'products': result,
-            'generated_at': datetime.utcnow().isoformat()
-        })
+        analytics = get_analytics_service()
+        result = analytics.get_purchase_frequency(user['id'], min_purchases)
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error getting frequency: {e}")
         return jsonify({'products': [], 'error': str(e)})
@@ -50,6 +35,7 @@ def get_frequency():
 
 @analytics_bp.route('/spending', methods=['GET'])
 @require_auth
+@cacheable(ttl=FREQUENCY_CACHE_TTL)
 def get_spending():
     """Get spending analytics."""
     user = get_current_user()
@@ -57,30 +43,25 @@ def get_spending():
 
     try:
         db = get_db()
-        monthly = db.get_monthly_spending(user['id'], months)
-
-        # Calculate totals
-        total = sum(m.get('total_spent', 0) or 0 for m in (monthly or []))
-
-        # Get category breakdown
-        analytics = get_analytics_service()
-        categories = analytics.get_spending_by_category(user['id'], months)
+        summary = db.get_spending_summary(user['id'], months)
 
         # Format monthly data
         monthly_data = []
-        for m in (monthly or []):
+        total = 0
+        for m in summary['monthly']:
+            total += m.get('total_spent') or 0
             monthly_data.append({
-                'month': m.get('month').isoformat() if m.get('month') else None,
+                'month': m.get('label'),
                 'order_count': m.get('order_count', 0),
                 'total_spent': m.get('total_spent', 0),
-                'total_items': m.get('total_items', 0)
+                'total_items': m.get('item_count', 0)
             })
 
         # Format category data
         category_data = []
-        for c in (categories or []):
+        for c in summary['categories']:
             category_data.append({
-                'category': c.get('category'),
+                'category': c.get('label'),
                 'total_spent': c.get('total_spent', 0),
                 'item_count': c.get('item_count', 0)
             })
@@ -102,47 +83,23 @@ def get_spending():
 
 @analytics_bp.route('/suggestions', methods=['GET'])
 @require_auth
+@cacheable(ttl=SUGGESTIONS_CACHE_TTL)
 def get_suggestions():
     """Get smart product suggestions."""
     user = get_current_user()
 
     try:
-        db = get_db()
-        frequency = db.get_purchase_frequency(user['id'], min_purchases=3)
-
-        due_for_reorder = []
-        now = datetime.utcnow()
-
-        for product in (frequency or []):
-            if product.get('last_purchased') and product.get('avg_days_between'):
-                last = product['last_purchased']
-                if isinstance(last, str):
-                    last = datetime.fromisoformat(last.replace('Z', '+00:00'))
-
-                avg_days = float(product['avg_days_between'])
-                expected_next = last + timedelta(days=avg_days)
-
-                if expected_next < now:
-                    days_overdue = (now - expected_next).days
-                    due_for_reorder.append({
-                        'product_id': product['picnic_product_id'],
-                        'product_name': product['product_name'],
-                        'days_overdue': days_overdue,
-                        'avg_days_between': avg_days,
-                        'confidence': float(product.get('confidence_score', 0))
-                    })
-
-        # Sort by most overdue first
-        due_for_reorder.sort(key=lambda x: x['days_overdue'], reverse=True)
+        analytics = get_analytics_service()
+        due = analytics.get_due_for_reorder(user['id'], limit=10)
 
         # Get recurring list suggestions
-        analytics = get_analytics_service()
         recurring = analytics.suggest_recurring_list(user['id'])
 
         return jsonify({
-            'due_for_reorder': due_for_reorder[:10],
+            'due_for_reorder': due['products'],
             'recurring_suggestions': recurring,
-            'frequently_bought_together': []  # TODO: Implement association rules
+            'frequently_bought_together': [],  # TODO: Implement association rules
+            'stale': due['stale']
         })
 
     except Exception as e:
@@ -186,6 +143,8 @@ def refresh_analytics():
 
 @analytics_bp.route('/top-products', methods=['GET'])
 @require_auth
+@cacheable(ttl=FREQUENCY_CACHE_TTL)
+@conditional
 def get_top_products():
     """Get top purchased products."""
     user = get_current_user()
@@ -194,18 +153,7 @@ def get_top_products():
     try:
         analytics = get_analytics_service()
         products = analytics.get_top_products(user['id'], limit)
-
-        result = []
-        for p in (products or []):
-            result.append({
-                'product_id': p.get('picnic_product_id'),
-                'product_name': p.get('product_name'),
-                'total_quantity': p.get('total_quantity'),
-                'order_count': p.get('order_count'),
-                'last_ordered': p.get('last_ordered').isoformat() if p.get('last_ordered') else None
-            })
-
-        return jsonify({'products': result})
+        return jsonify({'products': products})
 
     except Exception as e:
         logger.error(f"Error getting top products: {e}")
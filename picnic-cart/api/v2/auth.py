@@ -3,7 +3,7 @@
 from flask import Blueprint, request, jsonify, g
 
 from services.auth import get_auth_service, require_auth, get_current_user
-from services.mcp_client import get_mcp_client
+from services.mcp_client import get_picnic_user_id
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -35,14 +35,7 @@ def setup_pin():
     if not pin:
         return jsonify({'error': 'PIN is required'}), 400
 
-    # Get Picnic user ID from MCP server
-    try:
-        mcp = get_mcp_client()
-        user_data = mcp.get_user()
-        picnic_user_id = user_data.get('user_id') or user_data.get('id') or 'default'
-    except Exception as e:
-        # If MCP is not available, use a default ID
-        picnic_user_id = 'default-user'
+    picnic_user_id = get_picnic_user_id()
 
     try:
         auth_service = get_auth_service()
@@ -74,13 +67,7 @@ def verify_pin():
     if not pin:
         return jsonify({'error': 'PIN is required'}), 400
 
-    # Get Picnic user ID from MCP server
-    try:
-        mcp = get_mcp_client()
-        user_data = mcp.get_user()
-        picnic_user_id = user_data.get('user_id') or user_data.get('id') or 'default'
-    except Exception:
-        picnic_user_id = 'default-user'
+    picnic_user_id = get_picnic_user_id()
 
     try:
         auth_service = get_auth_service()
@@ -2,62 +2,130 @@
 
 from flask import Blueprint, request, jsonify
 
-from services.auth import require_auth
-from services.mcp_client import get_mcp_client
+from services.auth import require_auth, get_current_user
+from services.http_cache import conditional
+from services.mcp_client import get_mcp_client, tool_cache_key
+from services.cache import get_cache
 
 cart_bp = Blueprint('cart', __name__, url_prefix='/cart')
 
+# How long a user's last-seen cart is trusted for quantity lookups (seconds)
+CART_SNAPSHOT_TTL = 30
+
+
+def extract_quantity(actual):
+    """Get the quantity from a Picnic article's QUANTITY decorator (default 1)."""
+    decorators = actual.get('decorators')
+    if not decorators:
+        return 1
+    for decorator in decorators:
+        if decorator.get('type') == 'QUANTITY':
+            return decorator.get('quantity', 1)
+    return 1
+
+
+def _build_item(actual):
+    """Build a frontend cart item from a Picnic ORDER_ARTICLE."""
+    quantity = extract_quantity(actual)
+    aid = actual.get('id')
+    price = actual.get('price', 0)
+    return {
+        'id': aid,
+        'quantity': quantity,
+        'total_price': price * quantity,
+        'product': {
+            'id': aid,
+            'name': actual.get('name'),
+            'price': price,
+            'display_price': actual.get('display_price'),
+            'unit_quantity': actual.get('unit_quantity'),
+            'image_url': actual.get('image_url'),
+        }
+    }
+
 
 def transform_cart(raw_cart):
     """Transform raw cart data to frontend format."""
     if not raw_cart:
         return {'items': [], 'total_price': 0, 'total_count': 0}
 
-    items = []
-    total_count = 0
-
-    # Handle nested structure from Picnic API
-    cart_items = raw_cart.get('items', [])
-    for item in cart_items:
-        # Handle ORDER_LINE/ORDER_ARTICLE structure
-        actual_items = item.get('items', [item])
-        for actual in actual_items:
-            quantity = 1
-            for dec in actual.get('decorators', []):
-                if dec.get('type') == 'QUANTITY':
-                    quantity = dec.get('quantity', 1)
-                    break
-
-            items.append({
-                'id': actual.get('id'),
-                'quantity': quantity,
-                'total_price': actual.get('price', 0) * quantity,
-                'product': {
-                    'id': actual.get('id'),
-                    'name': actual.get('name'),
-                    'price': actual.get('price', 0),
-                    'display_price': actual.get('display_price'),
-                    'unit_quantity': actual.get('unit_quantity'),
-                    'image_url': actual.get('image_url'),
-                }
-            })
-            total_count += quantity
+    # Handle nested ORDER_LINE/ORDER_ARTICLE structure from Picnic API
+    items = [
+        _build_item(actual)
+        for line in raw_cart.get('items', [])
+        for actual in line.get('items', [line])
+    ]
 
     return {
         'items': items,
         'total_price': raw_cart.get('total_price', 0),
-        'total_count': total_count
+        'total_count': sum(item['quantity'] for item in items)
     }
 
 
+def _snapshot_key():
+    """Cache key for the current user's cart snapshot."""
+    return f"cart:{get_current_user()['id']}"
+
+
+def remember_cart(raw_cart):
+    """Transform a raw cart and store it as the user's cart snapshot."""
+    cart = transform_cart(raw_cart)
+    get_cache().set(_snapshot_key(), cart, CART_SNAPSHOT_TTL)
+    return cart
+
+
+def forget_cart():
+    """Drop the current user's cart snapshot and the legacy UI's cached cart."""
+    cache = get_cache()
+    cache.delete(_snapshot_key())
+    cache.delete(tool_cache_key('get_cart'))
+
+
+def get_snapshot():
+    """Get the current user's cart snapshot, or None if missing/expired."""
+    return get_cache().get(_snapshot_key())
+
+
+def current_cart(mcp):
+    """Get the last-seen cart, fetching it only when there is no recent snapshot."""
+    cart = get_snapshot()
+    if cart is None:
+        cart = remember_cart(mcp.get_cart())
+    return cart
+
+
+def cart_quantity(cart, product_id):
+    """Get the quantity of a product in a transformed cart (0 if absent)."""
+    return next(
+        (item['quantity'] for item in cart['items'] if item['id'] == product_id),
+        0
+    )
+
+
+def is_raw_cart(result):
+    """Check whether an MCP result looks like a cart body."""
+    return isinstance(result, dict) and 'items' in result
+
+
+def cart_after_mutation(mcp, result):
+    """Snapshot the cart returned by an MCP mutation.
+
+    The MCP mutation tools return the updated cart, so a follow-up get_cart()
+    is only needed if the result is not a cart body.
+    """
+    return remember_cart(result if is_raw_cart(result) else mcp.get_cart())
+
+
 @cart_bp.route('', methods=['GET'])
 @require_auth
+@conditional
 def get_cart():
     """Get current shopping cart."""
     try:
         mcp = get_mcp_client()
         raw_cart = mcp.get_cart()
-        cart = transform_cart(raw_cart)
+        cart = remember_cart(raw_cart)
         return jsonify(cart)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -77,9 +145,10 @@ def add_item():
     try:
         mcp = get_mcp_client()
         result = mcp.add_to_cart(product_id, quantity)
-        cart = transform_cart(mcp.get_cart())
+        cart = cart_after_mutation(mcp, result)
         return jsonify({'success': True, 'cart': cart})
     except Exception as e:
+        forget_cart()
         return jsonify({'error': str(e)}), 500
 
 
@@ -95,26 +164,20 @@ def update_item(product_id):
 
     try:
         mcp = get_mcp_client()
-        # Get current quantity first
-        cart = mcp.get_cart()
-        current_qty = 0
-        for item in cart.get('items', []):
-            for actual in item.get('items', [item]):
-                if actual.get('id') == product_id:
-                    for dec in actual.get('decorators', []):
-                        if dec.get('type') == 'QUANTITY':
-                            current_qty = dec.get('quantity', 1)
-                            break
-
-        diff = quantity - current_qty
+        cart = current_cart(mcp)
+        diff = quantity - cart_quantity(cart, product_id)
+        result = None
         if diff > 0:
-            mcp.add_to_cart(product_id, diff)
+            result = mcp.add_to_cart(product_id, diff)
         elif diff < 0:
-            mcp.remove_from_cart(product_id, abs(diff))
+            result = mcp.remove_from_cart(product_id, abs(diff))
+
+        if diff != 0:
+            cart = cart_after_mutation(mcp, result)
 
-        cart = transform_cart(mcp.get_cart())
         return jsonify({'success': True, 'cart': cart})
     except Exception as e:
+        forget_cart()
         return jsonify({'error': str(e)}), 500
 
 
@@ -126,15 +189,18 @@ def remove_item(product_id):
 
     try:
         mcp = get_mcp_client()
-        if quantity:
-            mcp.remove_from_cart(product_id, quantity)
-        else:
-            # Remove all
-            mcp.remove_from_cart(product_id, 999)
-
-        cart = transform_cart(mcp.get_cart())
+        if not quantity:
+            # Remove all: take exactly the quantity currently in the cart
+            cart = current_cart(mcp)
+            quantity = cart_quantity(cart, product_id)
+            if not quantity:
+                return jsonify({'success': True, 'cart': cart})
+
+        result = mcp.remove_from_cart(product_id, quantity)
+        cart = cart_after_mutation(mcp, result)
         return jsonify({'success': True, 'cart': cart})
     except Exception as e:
+        forget_cart()
         return jsonify({'error': str(e)}), 500
 
 
@@ -145,6 +211,7 @@ def clear_cart():
     try:
         mcp = get_mcp_client()
         mcp.clear_cart()
+        forget_cart()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -162,36 +229,37 @@ def bulk_add():
 
     try:
         mcp = get_mcp_client()
-        results = []
-        added = 0
-        failed = 0
-
-        for item in items:
-            product_id = item.get('productId') or item.get('product_id')
-            quantity = item.get('quantity', 1)
+        result = mcp.bulk_add_to_cart([
+            {
+                'productId': item.get('productId') or item.get('product_id'),
+                'count': item.get('quantity', 1)
+            }
+            for item in items
+        ])
 
-            try:
-                mcp.add_to_cart(product_id, quantity)
+        results = []
+        for r in result.get('results', []):
+            if r.get('success'):
                 results.append({
-                    'productId': product_id,
+                    'productId': r.get('productId'),
                     'success': True,
-                    'quantity': quantity
+                    'quantity': r.get('count')
                 })
-                added += 1
-            except Exception as e:
+            else:
                 results.append({
-                    'productId': product_id,
+                    'productId': r.get('productId'),
                     'success': False,
-                    'error': str(e)
+                    'error': r.get('error')
                 })
-                failed += 1
+        added = sum(1 for r in results if r['success'])
 
-        cart = transform_cart(mcp.get_cart())
+        cart = cart_after_mutation(mcp, result.get('cart'))
         return jsonify({
             'added': added,
-            'failed': failed,
+            'failed': len(results) - added,
             'results': results,
             'cart': cart
         })
     except Exception as e:
+        forget_cart()
         return jsonify({'error': str(e)}), 500
@@ -1,23 +1,42 @@
 """Recurring Lists API endpoints."""
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 
 from services.auth import require_auth, get_current_user
+from services.http_cache import conditional, cacheable
 from services.db import get_db
 from services.mcp_client import get_mcp_client
+from services.analytics import get_analytics_service, SUGGESTIONS_CACHE_TTL
+from services.cache import get_cache
+from services import fastjson
+
+from .cart import forget_cart
 
 lists_bp = Blueprint('lists', __name__, url_prefix='/lists')
 
+# Cache TTL (seconds) for a user's full collection of recurring lists
+RECURRING_LISTS_CACHE_TTL = 60
+
+# Max items per auto-generated list suggestion
+SUGGESTED_LIST_SIZE = 10
+
 
 @lists_bp.route('/recurring', methods=['GET'])
 @require_auth
+@cacheable(ttl=0)
+@conditional
 def get_recurring_lists():
     """Get all recurring lists for the user."""
     user = get_current_user()
 
     try:
         db = get_db()
-        lists = db.get_recurring_lists(user['id'])
+        lists, _ = get_cache().get_or_load(
+            f"lists:{user['id']}",
+            # Rows hold datetimes; cache them already in their response form
+            lambda: fastjson.loads(current_app.json.dumps(db.get_recurring_lists(user['id']))),
+            RECURRING_LISTS_CACHE_TTL
+        )
         return jsonify({'lists': lists})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -36,6 +55,7 @@ def create_recurring_list():
     try:
         db = get_db()
         new_list = db.create_recurring_list(user['id'], data)
+        get_cache().delete(f"lists:{user['id']}")
         return jsonify(new_list), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -49,11 +69,10 @@ def get_recurring_list(list_id):
 
     try:
         db = get_db()
-        lists = db.get_recurring_lists(user['id'])
-        for lst in lists:
-            if str(lst['id']) == list_id:
-                return jsonify(lst)
-        return jsonify({'error': 'List not found'}), 404
+        lst = db.get_recurring_list_by_id(user['id'], list_id)
+        if not lst:
+            return jsonify({'error': 'List not found'}), 404
+        return jsonify(lst)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -83,13 +102,7 @@ def add_list_to_cart(list_id):
 
     try:
         db = get_db()
-        lists = db.get_recurring_lists(user['id'])
-
-        target_list = None
-        for lst in lists:
-            if str(lst['id']) == list_id:
-                target_list = lst
-                break
+        target_list = db.get_recurring_list_by_id(user['id'], list_id)
 
         if not target_list:
             return jsonify({'error': 'List not found'}), 404
@@ -99,20 +112,19 @@ def add_list_to_cart(list_id):
             return jsonify({'added': 0, 'failed': 0, 'cart': {}})
 
         mcp = get_mcp_client()
-        added = 0
-        failed = 0
-
-        for item in items:
-            try:
-                mcp.add_to_cart(
-                    item['picnic_product_id'],
-                    item.get('default_quantity', 1)
-                )
-                added += 1
-            except:
-                failed += 1
-
-        cart = mcp.get_cart()
+        result = mcp.bulk_add_to_cart([
+            {
+                'productId': item['picnic_product_id'],
+                'count': item.get('default_quantity', 1)
+            }
+            for item in items
+        ])
+
+        added = sum(1 for r in result.get('results', []) if r.get('success'))
+        failed = len(items) - added
+
+        forget_cart()
+        cart = result.get('cart') or mcp.get_cart()
         return jsonify({
             'added': added,
             'failed': failed,
@@ -130,28 +142,29 @@ def get_suggestions():
     user = get_current_user()
 
     try:
-        db = get_db()
-        frequency = db.get_purchase_frequency(user['id'], min_purchases=5)
-
-        # Group products by suggested frequency
+        analytics = get_analytics_service()
+        frequency = analytics.get_purchase_frequency(
+            user['id'], min_purchases=5, ttl=SUGGESTIONS_CACHE_TTL
+        )
+
+        # Group products by suggested frequency. Rows come ordered by
+        # avg_days_between (NULLs last), so weekly products come first and
+        # the scan can stop at the first product slower than biweekly.
         weekly_items = []
         biweekly_items = []
-        monthly_items = []
-
-        for product in frequency:
-            days = product.get('avg_days_between', 30)
-            item = {
-                'product_id': product['picnic_product_id'],
-                'product_name': product['product_name'],
-                'default_quantity': 1
-            }
 
-            if days <= 7:
-                weekly_items.append(item)
-            elif days <= 14:
-                biweekly_items.append(item)
-            else:
-                monthly_items.append(item)
+        for product in frequency['products']:
+            days = product['avg_days_between']
+            if days is None or days > 14:
+                break
+
+            bucket = weekly_items if days <= 7 else biweekly_items
+            if len(bucket) < SUGGESTED_LIST_SIZE:
+                bucket.append({
+                    'product_id': product['product_id'],
+                    'product_name': product['product_name'],
+                    'default_quantity': 1
+                })
 
         suggestions = []
 
@@ -161,7 +174,7 @@ def get_suggestions():
                 'name': 'Wekelijkse boodschappen',
                 'frequency': 'weekly',
                 'is_auto_generated': True,
-                'items': weekly_items[:10]
+                'items': weekly_items
             })
 
         if biweekly_items:
@@ -170,10 +183,10 @@ def get_suggestions():
                 'name': 'Tweewekelijkse boodschappen',
                 'frequency': 'biweekly',
                 'is_auto_generated': True,
-                'items': biweekly_items[:10]
+                'items': biweekly_items
             })
 
-        return jsonify({'suggestions': suggestions})
+        return jsonify({'suggestions': suggestions, 'stale': frequency['stale']})
 
     except Exception as e:
         return jsonify({'suggestions': []})
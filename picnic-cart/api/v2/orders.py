@@ -3,8 +3,11 @@
 from flask import Blueprint, request, jsonify
 
 from services.auth import require_auth, get_current_user
-from services.mcp_client import get_mcp_client
+from services.mcp_client import get_mcp_client, extract_list
 from services.db import get_db
+from services.http_cache import stream_json_list
+
+from .cart import extract_quantity
 
 orders_bp = Blueprint('orders', __name__, url_prefix='/orders')
 
@@ -12,42 +15,31 @@ orders_bp = Blueprint('orders', __name__, url_prefix='/orders')
 def transform_order(raw_order):
     """Transform raw order/delivery data to frontend format."""
     # Handle different date field names
-    delivery_date = (
-        raw_order.get('delivery_date') or
-        raw_order.get('slot', {}).get('window_start') or
-        raw_order.get('delivery_time', {}).get('start')
-    )
-
-    slot_start = (
-        raw_order.get('delivery_slot_start') or
-        raw_order.get('slot', {}).get('window_start') or
-        raw_order.get('delivery_time', {}).get('start')
-    )
-
-    slot_end = (
-        raw_order.get('delivery_slot_end') or
-        raw_order.get('slot', {}).get('window_end') or
-        raw_order.get('delivery_time', {}).get('end')
-    )
+    slot = raw_order.get('slot') or {}
+    delivery_time = raw_order.get('delivery_time') or {}
+    window_start = slot.get('window_start') or delivery_time.get('start')
+    window_end = slot.get('window_end') or delivery_time.get('end')
+
+    delivery_date = raw_order.get('delivery_date') or window_start
+    slot_start = raw_order.get('delivery_slot_start') or window_start
+    slot_end = raw_order.get('delivery_slot_end') or window_end
 
     # Extract items
     items = []
-    raw_items = raw_order.get('orders', [{}])[0].get('items', []) if raw_order.get('orders') else raw_order.get('items', [])
+    sub_orders = raw_order.get('orders')
+    if sub_orders:
+        raw_items = sub_orders[0].get('items', [])
+    else:
+        raw_items = raw_order.get('items', [])
 
     for item in raw_items:
         actual_items = item.get('items', [item])
         for actual in actual_items:
-            quantity = 1
-            for dec in actual.get('decorators', []):
-                if dec.get('type') == 'QUANTITY':
-                    quantity = dec.get('quantity', 1)
-                    break
-
             items.append({
                 'id': actual.get('id'),
                 'product_id': actual.get('id'),
                 'product_name': actual.get('name'),
-                'quantity': quantity,
+                'quantity': extract_quantity(actual),
                 'price': actual.get('price', 0),
                 'image_url': actual.get('image_url'),
             })
@@ -70,15 +62,13 @@ def get_upcoming():
     """Get upcoming/scheduled orders."""
     try:
         mcp = get_mcp_client()
-        result = mcp.call_tool('get_order_history', {
+        call = mcp.call_tool if request.args.get('no_cache') == '1' else mcp.call_tool_cached
+        result = call('get_order_history', {
             'filter': 'CURRENT',
             'limit': 10
         })
 
-        deliveries = result.get('deliveries', []) if isinstance(result, dict) else result
-        if not isinstance(deliveries, list):
-            deliveries = []
-
+        deliveries = extract_list(result, 'deliveries')
         orders = [transform_order(d) for d in deliveries]
 
         return jsonify({
@@ -99,26 +89,23 @@ def get_history():
 
     try:
         mcp = get_mcp_client()
-        result = mcp.call_tool('get_order_history', {
-            'filter': 'COMPLETED',
-            'limit': limit,
-            'offset': offset
-        })
+        # The tool paginates server-side, so only the requested page is sent
+        result = mcp.get_order_history('COMPLETED', limit=limit, offset=offset)
 
-        deliveries = result.get('deliveries', []) if isinstance(result, dict) else result
-        if not isinstance(deliveries, list):
-            deliveries = []
+        deliveries = extract_list(result, 'deliveries')
+        total_from_tool = result.get('total') if isinstance(result, dict) else None
 
-        orders = [transform_order(d) for d in deliveries]
-        
-        total_from_tool = result.get('total')
-        has_more = (offset + len(orders)) < total_from_tool if total_from_tool is not None else len(orders) == limit
+        count = len(deliveries)
+        has_more = (offset + count) < total_from_tool if total_from_tool is not None else count == limit
 
-        return jsonify({
-            'orders': orders,
-            'total': total_from_tool if total_from_tool is not None else len(orders),
-            'has_more': has_more
-        })
+        # Orders are transformed as they are streamed, so only the raw
+        # deliveries are held in memory at once
+        return stream_json_list(
+            'orders',
+            (transform_order(d) for d in deliveries),
+            total=total_from_tool if total_from_tool is not None else count,
+            has_more=has_more
+        )
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -186,18 +173,18 @@ def sync_orders():
             'limit': 100
         })
 
-        deliveries = result.get('deliveries', []) if isinstance(result, dict) else result
-        if not isinstance(deliveries, list):
-            deliveries = []
+        deliveries = extract_list(result, 'deliveries')
 
-        synced = 0
+        orders = []
         for delivery in deliveries:
             try:
                 order = transform_order(delivery)
-                db.cache_order(user['id'], order)
-                synced += 1
-            except Exception as e:
-                pass
+            except Exception:
+                continue
+            if order.get('id'):
+                orders.append(order)
+
+        synced = db.cache_orders(user['id'], orders)
 
         return jsonify({
             'synced': synced,
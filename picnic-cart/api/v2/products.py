@@ -1,13 +1,23 @@
 """Products API endpoints."""
 
+import logging
 from flask import Blueprint, request, jsonify
 
 from services.auth import require_auth
-from services.mcp_client import get_mcp_client
+from services.mcp_client import get_mcp_client, extract_list, normalize_query
+
+from .cart import extract_quantity
+
+logger = logging.getLogger(__name__)
 
 products_bp = Blueprint('products', __name__, url_prefix='/products')
 
 
+def use_cache():
+    """Whether cached MCP results may be used (bypass with ?no_cache=1)."""
+    return request.args.get('no_cache') != '1'
+
+
 def transform_product(raw_product):
     """Transform raw product data to frontend format."""
     return {
@@ -39,38 +49,33 @@ def search_products():
 
     try:
         mcp = get_mcp_client()
-        raw_results = mcp.search_products(query)
-
-        # Handle different response formats
-        if isinstance(raw_results, dict):
-            products = raw_results.get('products', raw_results.get('items', []))
-        elif isinstance(raw_results, list):
-            products = raw_results
-        else:
-            products = []
+        # The search, cart and upcoming-order lookups are independent; only
+        # the search result is cacheable
+        raw_results, cart, orders = mcp.call_tools([
+            ('search_products', {'query': normalize_query(query)}),
+            ('get_cart', None),
+            ('search_orders', {'query': query, 'scope': 'upcoming'}),
+        ], use_cache=use_cache())
+        if isinstance(raw_results, Exception):
+            raise raw_results
+
+        products = extract_list(raw_results, 'products', 'items')
 
         # Transform products
         results = [transform_product(p) for p in products]
 
-        # Get current cart to show what's in cart
+        # Use current cart to show what's in cart
         in_cart = {}
         try:
-            cart = mcp.get_cart()
             for item in cart.get('items', []):
                 for actual in item.get('items', [item]):
-                    quantity = 1
-                    for dec in actual.get('decorators', []):
-                        if dec.get('type') == 'QUANTITY':
-                            quantity = dec.get('quantity', 1)
-                            break
-                    in_cart[actual.get('id')] = quantity
+                    in_cart[actual.get('id')] = extract_quantity(actual)
         except:
             pass
 
-        # Get upcoming orders to show what's ordered
+        # Use upcoming orders to show what's ordered
         in_upcoming_order = {}
         try:
-            orders = mcp.call_tool('search_orders', {'query': query, 'scope': 'upcoming'})
             if orders and 'matches' in orders:
                 for match in orders['matches']:
                     in_upcoming_order[match.get('productId')] = True
@@ -94,13 +99,20 @@ def get_product(product_id):
     """Get single product details."""
     try:
         mcp = get_mcp_client()
-        # Search for the specific product
-        results = mcp.search_products(product_id)
+        try:
+            product = mcp.get_product_details(product_id)
+        except Exception as e:
+            logger.warning(f"Product lookup failed for {product_id}, falling back to search: {e}")
+            product = None
+
+        # Fall back to searching for the ID
+        if not isinstance(product, dict) or not product.get('id'):
+            results = mcp.search_products(product_id)
+            by_id = {p.get('id'): p for p in results} if isinstance(results, list) else {}
+            product = by_id.get(product_id)
 
-        if isinstance(results, list) and len(results) > 0:
-            for p in results:
-                if p.get('id') == product_id:
-                    return jsonify(transform_product(p))
+        if product:
+            return jsonify(transform_product(product))
 
         return jsonify({'error': 'Product not found'}), 404
 
@@ -114,7 +126,7 @@ def get_categories():
     """Get product categories."""
     try:
         mcp = get_mcp_client()
-        categories = mcp.get_categories()
+        categories = mcp.get_categories(use_cache=use_cache())
         return jsonify({'categories': categories})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -3,14 +3,19 @@
 import os
 import re
 import json
+import uuid
 import logging
 from flask import Blueprint, request, jsonify
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from services.auth import require_auth, get_current_user
-from services.mcp_client import get_mcp_client
+from services.mcp_client import get_mcp_client, extract_list
 from services.db import get_db
+from services import fastjson
+
+from .cart import forget_cart
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +26,57 @@ recipes_bp = Blueprint('recipes', __name__, url_prefix='/recipes')
 HA_URL = os.getenv('HA_URL', 'http://supervisor/core')
 HA_TOKEN = os.getenv('SUPERVISOR_TOKEN', os.getenv('HA_LONG_LIVED_TOKEN', ''))
 
+# Keep-alive connections shared by Gemini (via Home Assistant) and page fetches
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+_session.mount('http://', _adapter)
+_session.mount('https://', _adapter)
+
+# Max recipes returned by one /history request
+MAX_HISTORY_LIMIT = 100
+
+# A non-empty ingredient line that isn't a "#" comment, without surrounding
+# whitespace
+INGREDIENT_LINE_RE = re.compile(r'^[^\S\n]*([^#\s][^\n]*?)[^\S\n]*$', re.MULTILINE)
+
+# Upper bound on how much of a recipe page is downloaded (bytes)
+MAX_RECIPE_PAGE_BYTES = 1024 * 1024
+
+# How much of the page head is sent to Gemini when there is no JSON-LD (bytes)
+GEMINI_HTML_BYTES = 10000
+
+# Structured recipe data (schema.org JSON-LD) embedded in recipe pages,
+# matched on the raw page bytes so the page is never decoded as a whole
+JSON_LD_RE = re.compile(
+    rb'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.DOTALL | re.IGNORECASE
+)
+SCRIPT_OPEN_RE = re.compile(rb'<script', re.IGNORECASE)
+SCRIPT_CLOSE_RE = re.compile(rb'</script>', re.IGNORECASE)
+
+# JSON wrapped in a markdown code fence in a model response
+JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)\s*```', re.DOTALL | re.IGNORECASE)
+
+_json_decoder = json.JSONDecoder()
+
+
+def extract_json(text: str):
+    """Parse the JSON value in a model response, fenced or not.
+
+    Falls back to decoding from the first bracket when the response has
+    text around the JSON. Raises ValueError if no JSON can be found.
+    """
+    match = JSON_FENCE_RE.search(text)
+    body = match.group(1) if match else text.strip()
+    try:
+        return fastjson.loads(body)
+    except ValueError:
+        starts = [i for i in (body.find('['), body.find('{')) if i >= 0]
+        if not starts:
+            raise
+        value, _ = _json_decoder.raw_decode(body, min(starts))
+        return value
+
 
 def call_gemini(prompt: str) -> str:
     """Call Gemini via Home Assistant conversation API."""
@@ -29,7 +85,7 @@ def call_gemini(prompt: str) -> str:
         return None
 
     try:
-        response = requests.post(
+        response = _session.post(
             f"{HA_URL}/api/services/conversation/process",
             json={
                 "text": prompt,
@@ -42,7 +98,7 @@ def call_gemini(prompt: str) -> str:
             timeout=60
         )
         response.raise_for_status()
-        result = response.json()
+        result = fastjson.loads(response.content)
 
         # Extract response text
         speech = result.get('response', {}).get('speech', {})
@@ -73,50 +129,70 @@ Ingredients:
 
     if response:
         try:
-            # Clean markdown code blocks
-            if '```json' in response:
-                response = response.split('```json')[1].split('```')[0]
-            elif '```' in response:
-                response = response.split('```')[1].split('```')[0]
-            return json.loads(response.strip())
-        except json.JSONDecodeError:
+            return extract_json(response)
+        except ValueError:
             pass
 
-    # Fallback: simple line-by-line parsing
-    lines = text.strip().split('\n')
-    ingredients = []
-    for line in lines:
-        line = line.strip()
-        if line and not line.startswith('#'):
-            ingredients.append({
-                'original_text': line,
-                'quantity': None,
-                'unit': None,
-                'ingredient': line,
-                'search_term': line.split()[-1] if line else ''
-            })
-    return ingredients
+    # Fallback: one ingredient per non-empty, non-comment line
+    return [
+        {
+            'original_text': line,
+            'quantity': None,
+            'unit': None,
+            'ingredient': line,
+            'search_term': line.rsplit(None, 1)[-1]
+        }
+        for line in INGREDIENT_LINE_RE.findall(text)
+    ]
+
+
+def download_recipe_page(url: str) -> bytes:
+    """Download a recipe page, stopping early once a recipe's JSON-LD is in.
+
+    Reads at most MAX_RECIPE_PAGE_BYTES so huge pages aren't held in memory.
+    """
+    with _session.get(
+        url,
+        stream=True,
+        timeout=30,
+        headers={'User-Agent': 'Mozilla/5.0 (compatible; PicnicBot/1.0)'}
+    ) as response:
+        response.raise_for_status()
+        buf = bytearray()
+        scan_from = 0
+        for chunk in response.iter_content(chunk_size=16384):
+            buf.extend(chunk)
+
+            # Done once a complete JSON-LD block mentions a recipe
+            for match in JSON_LD_RE.finditer(buf, scan_from):
+                if b'Recipe' in match.group(1):
+                    return bytes(buf)
+                scan_from = match.end()
+
+            # Resume at the script tag that is still open, if any; anything
+            # before the last closing tag has been fully matched already
+            last_close = scan_from
+            for match in SCRIPT_CLOSE_RE.finditer(buf, scan_from):
+                last_close = match.end()
+            opening = SCRIPT_OPEN_RE.search(buf, last_close)
+            # Without one, keep an overlap for a tag split across chunks
+            scan_from = opening.start() if opening else max(last_close, len(buf) - 16)
+
+            if len(buf) >= MAX_RECIPE_PAGE_BYTES:
+                break
+        return bytes(buf)
 
 
 def fetch_recipe_from_url(url: str) -> dict:
     """Fetch and parse recipe from URL."""
     try:
-        response = requests.get(
-            url,
-            timeout=30,
-            headers={'User-Agent': 'Mozilla/5.0 (compatible; PicnicBot/1.0)'}
-        )
-        response.raise_for_status()
-        html = response.text
+        page = download_recipe_page(url)
 
-        # Try to extract structured data (JSON-LD)
-        import re
-        json_ld_pattern = r'<script[^>]*type="application/ld\+json"[^>]*>(.*?)</script>'
-        matches = re.findall(json_ld_pattern, html, re.DOTALL)
-
-        for match in matches:
+        # Try to extract structured data (JSON-LD), stopping at the first
+        # script block that contains a recipe
+        for match in JSON_LD_RE.finditer(page):
             try:
-                data = json.loads(match)
+                data = fastjson.loads(match.group(1))
 
                 # Handle array
                 if isinstance(data, list):
@@ -129,27 +205,27 @@ def fetch_recipe_from_url(url: str) -> dict:
                     for item in data['@graph']:
                         if item.get('@type') == 'Recipe':
                             return extract_recipe_from_schema(item, url)
-            except json.JSONDecodeError:
+            except ValueError:
+                # Invalid JSON or undecodable bytes in this block
                 continue
 
-        # Fallback: use Gemini to extract
+        # Fallback: use Gemini to extract; only the head is decoded
+        head = page[:GEMINI_HTML_BYTES].decode('utf-8', errors='replace')
         prompt = f"""Extract the recipe information from this webpage. Return JSON with:
 - title: recipe name
 - ingredients: array of ingredient strings
 
 URL: {url}
 
-HTML (first 10000 chars):
-{html[:10000]}
+HTML (first {GEMINI_HTML_BYTES} bytes):
+{head}
 
 Return ONLY valid JSON."""
 
         response = call_gemini(prompt)
         if response:
             try:
-                if '```json' in response:
-                    response = response.split('```json')[1].split('```')[0]
-                data = json.loads(response.strip())
+                data = extract_json(response)
                 return {
                     'title': data.get('title', 'Recipe'),
                     'ingredients': data.get('ingredients', []),
@@ -313,18 +389,24 @@ def match_products():
         matches = []
         not_found = []
 
-        for ingredient in ingredients:
-            search_term = ingredient.get('search_term') or ingredient.get('ingredient', '')
-
+        search_terms = [
+            (ingredient.get('search_term') or ingredient.get('ingredient', '')).strip().lower()
+            for ingredient in ingredients
+        ]
+        # Search each distinct term once
+        unique_terms = list(dict.fromkeys(search_terms))
+        results_by_term = dict(zip(unique_terms, mcp.call_tools(
+            [('search_products', {'query': term}) for term in unique_terms],
+            use_cache=True
+        )))
+        search_results = [results_by_term[term] for term in search_terms]
+
+        for ingredient, search_term, results in zip(ingredients, search_terms, search_results):
             try:
-                results = mcp.search_products(search_term)
+                if isinstance(results, Exception):
+                    raise results
 
-                if isinstance(results, dict):
-                    products = results.get('products', results.get('items', []))
-                elif isinstance(results, list):
-                    products = results
-                else:
-                    products = []
+                products = extract_list(results, 'products', 'items')
 
                 if products:
                     # Add confidence scores for fallback
@@ -372,32 +454,58 @@ def match_products():
 @recipes_bp.route('/add-to-cart', methods=['POST'])
 @require_auth
 def add_to_cart():
-    """Add matched recipe products to cart."""
+    """Add matched recipe products to cart.
+
+    The updated cart is only included with ?return_cart=1, saving an MCP
+    round trip for clients that refresh the cart themselves.
+    """
     data = request.get_json()
     matches = data.get('matches', [])
 
     if not matches:
         return jsonify({'added': 0, 'failed': 0})
 
+    selected = [match['selected'] for match in matches if match.get('selected')]
+    items = [
+        {'productId': product['id'], 'count': 1}
+        for product in selected
+        if product.get('id')
+    ]
+
     mcp = get_mcp_client()
-    added = 0
-    failed = 0
+    result = {}
+    if items:
+        try:
+            result = mcp.bulk_add_to_cart(items)
+        except Exception as e:
+            logger.error(f"Failed to add recipe products to cart: {e}")
 
-    for match in matches:
-        selected = match.get('selected')
-        if selected:
-            try:
-                mcp.add_to_cart(selected['id'], 1)
-                added += 1
-            except:
-                failed += 1
+    added = sum(1 for r in result.get('results', []) if r.get('success'))
+    failed = len(selected) - added
+
+    forget_cart()
+    body = {'added': added, 'failed': failed}
+    if request.args.get('return_cart') == '1':
+        body['cart'] = result.get('cart') or mcp.get_cart()
+    return jsonify(body)
 
-    cart = mcp.get_cart()
-    return jsonify({
-        'added': added,
-        'failed': failed,
-        'cart': cart
-    })
+
+def decode_history_row(row: dict) -> dict:
+    """Decode the JSON columns of a recipe_history row in place.
+
+    MariaDB's JSON type is an alias for LONGTEXT, so PyMySQL returns these
+    columns as strings; decode them once here instead of sending the client
+    JSON-encoded strings inside the response. DictCursor rows are already
+    fresh dicts, so no copy is made.
+    """
+    for column in ('parsed_ingredients', 'matched_products'):
+        value = row.get(column)
+        if isinstance(value, (str, bytes)):
+            try:
+                row[column] = fastjson.loads(value)
+            except ValueError:
+                row[column] = []
+    return row
 
 
 @recipes_bp.route('/history', methods=['GET'])
@@ -405,7 +513,7 @@ def add_to_cart():
 def get_history():
     """Get recipe import history."""
     user = get_current_user()
-    limit = request.args.get('limit', 20, type=int)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_HISTORY_LIMIT)
 
     db = get_db()
     with db.get_cursor() as cursor:
@@ -424,7 +532,7 @@ def get_history():
         )
         recipes = cursor.fetchall()
 
-    return jsonify({'recipes': [dict(r) for r in recipes] if recipes else []})
+    return jsonify({'recipes': [decode_history_row(r) for r in recipes] if recipes else []})
 
 
 @recipes_bp.route('/save-history', methods=['POST'])
@@ -440,25 +548,24 @@ def save_history():
             return jsonify({'error': 'Database not available'}), 503
 
         try:
-            import json as json_module
+            history_id = str(uuid.uuid4())
             cursor.execute(
                 """INSERT INTO recipe_history
-                   (user_id, source_type, source_url, recipe_title,
+                   (id, user_id, source_type, source_url, recipe_title,
                     parsed_ingredients, matched_products, items_added_to_cart)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s)
-                   RETURNING id""",
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
                 (
+                    history_id,
                     user['id'],
                     data.get('source_type', 'url'),
                     data.get('source_url'),
                     data.get('recipe_title'),
-                    json_module.dumps(data.get('parsed_ingredients', [])),
-                    json_module.dumps(data.get('matched_products', [])),
+                    fastjson.dumps(data.get('parsed_ingredients', [])),
+                    fastjson.dumps(data.get('matched_products', [])),
                     data.get('items_added_to_cart', 0)
                 )
             )
-            result = cursor.fetchone()
-            return jsonify({'success': True, 'id': str(result['id'])})
+            return jsonify({'success': True, 'id': history_id})
 
         except Exception as e:
             logger.error(f"Failed to save recipe history: {e}")
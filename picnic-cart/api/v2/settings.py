@@ -1,20 +1,42 @@
 """Settings API endpoints."""
 
+from types import MappingProxyType
+
 from flask import Blueprint, request, jsonify
 
 from services.auth import require_auth, get_current_user
 
 settings_bp = Blueprint('settings', __name__, url_prefix='/settings')
 
-# Default settings
-DEFAULT_SETTINGS = {
+# Default settings (read-only; copy before modifying)
+DEFAULT_SETTINGS = MappingProxyType({
     'ui_mode': 'full',
     'theme': 'light',
     'language': 'nl',
     'session_timeout_minutes': 30,
     'show_product_images': True,
     'sound_enabled': False,
-}
+})
+
+UI_MODES = frozenset({'full', 'ereader'})
+THEMES = frozenset({'light', 'dark', 'auto'})
+LANGUAGES = frozenset({'nl', 'en', 'de'})
+
+
+def _one_of(allowed):
+    """Validator accepting only the strings in allowed (None means reject)."""
+    return lambda value: value if isinstance(value, str) and value in allowed else None
+
+
+# Validator per setting; returns the value to store, or None to keep the default
+SETTING_VALIDATORS = MappingProxyType({
+    'ui_mode': _one_of(UI_MODES),
+    'theme': _one_of(THEMES),
+    'language': _one_of(LANGUAGES),
+    'session_timeout_minutes': int,
+    'show_product_images': bool,
+    'sound_enabled': bool,
+})
 
 
 @settings_bp.route('', methods=['GET'])
@@ -22,7 +44,7 @@ DEFAULT_SETTINGS = {
 def get_settings():
     """Get user settings."""
     # TODO: Load from database
-    return jsonify(DEFAULT_SETTINGS)
+    return jsonify(dict(DEFAULT_SETTINGS))
 
 
 @settings_bp.route('', methods=['PUT'])
@@ -32,25 +54,13 @@ def update_settings():
     data = request.get_json()
 
     # Validate and merge with defaults
-    settings = {**DEFAULT_SETTINGS}
-
-    if 'ui_mode' in data and data['ui_mode'] in ['full', 'ereader']:
-        settings['ui_mode'] = data['ui_mode']
-
-    if 'theme' in data and data['theme'] in ['light', 'dark', 'auto']:
-        settings['theme'] = data['theme']
-
-    if 'language' in data and data['language'] in ['nl', 'en', 'de']:
-        settings['language'] = data['language']
-
-    if 'session_timeout_minutes' in data:
-        settings['session_timeout_minutes'] = int(data['session_timeout_minutes'])
-
-    if 'show_product_images' in data:
-        settings['show_product_images'] = bool(data['show_product_images'])
+    settings = dict(DEFAULT_SETTINGS)
 
-    if 'sound_enabled' in data:
-        settings['sound_enabled'] = bool(data['sound_enabled'])
+    for key, validate in SETTING_VALIDATORS.items():
+        if key in data:
+            value = validate(data[key])
+            if value is not None:
+                settings[key] = value
 
     # TODO: Save to database
 
@@ -75,7 +85,7 @@ def set_mode():
     data = request.get_json()
     mode = data.get('mode')
 
-    if mode not in ['full', 'ereader']:
+    if not isinstance(mode, str) or mode not in UI_MODES:
         return jsonify({'error': 'Invalid mode'}), 400
 
     # TODO: Save to database
@@ -1,10 +1,29 @@
 import os
-import traceback
+import atexit
+import hashlib
+import logging
+import queue
+import signal
+from logging.handlers import QueueHandler, QueueListener
 import requests
 import json
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_from_directory, make_response
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_from_directory, make_response, Response
+from flask.json.provider import DefaultJSONProvider
 from dotenv import load_dotenv
 from functools import wraps
+from urllib.parse import urlencode
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    from whitenoise import WhiteNoise
+    HAS_WHITENOISE = True
+except ImportError:
+    HAS_WHITENOISE = False
 
 # Import auth service for PIN-based authentication
 try:
@@ -15,37 +34,133 @@ except ImportError:
 
 load_dotenv()
 
+# Imported after load_dotenv so its settings can come from .env
+from services.mcp_client import (
+    get_mcp_client, get_picnic_user_id, mcp_breaker, is_server_failure, encode_tool_call,
+    normalize_query, tool_cache_key, JSON_HEADERS, MCP_CACHE_TTLS
+)
+from services.cache import get_cache
+from services import fastjson
+
 __version__ = "4.0.5"
 
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+
+def configure_logging():
+    """Send all log records through a queue to a background writer thread.
+
+    Request threads only enqueue records; formatting and the blocking write
+    to stdout happen on the listener thread.
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(LOG_LEVEL)
+
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-key-change-in-production')
 
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider that serializes with orjson.
+
+    Datetimes and other types orjson can't handle natively are passed to
+    the default provider's hook, so the wire format stays the same.
+    """
+
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if HAS_ORJSON else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        # orjson has no object_hook, which the session serializer relies on
+        # to restore tagged values (e.g. the flashed (category, message) tuples)
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+if HAS_ORJSON:
+    app.json = ORJSONProvider(app)
+
 # MCP Server configuration
 MCP_SERVER_URL = os.getenv('MCP_SERVER_URL', 'http://localhost:3000')
 
+# How long the legacy cart page reuses a fetched cart (seconds); the legacy
+# mutations drop it, so this only absorbs reloads and quick navigation
+LEGACY_CART_TTL = 5
+
+# The legacy routes share the v2 client's keep-alive connection pool (and
+# its retry policy) to the MCP server rather than keeping a second one
+MCP_SESSION = get_mcp_client().session
+
 # Static files directory for React frontend
 STATIC_DIR = os.path.join(os.path.dirname(__file__), 'frontend', 'dist')
 
+# Hashed build assets never change under the same URL
+ASSET_MAX_AGE = 31536000  # 1 year
+
+
+def load_index_html():
+    """Read the React build's index.html, or None if it hasn't been built."""
+    try:
+        with open(os.path.join(STATIC_DIR, 'index.html'), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def reload_index_html(*_):
+    """(Re)load the cached SPA shell; also installed as the SIGHUP handler."""
+    global INDEX_HTML, INDEX_HTML_ETAG
+    html = load_index_html()
+    etag = hashlib.sha1(html).hexdigest() if html is not None else None
+    INDEX_HTML, INDEX_HTML_ETAG = html, etag
+
+
+# The SPA shell is built into the image, so read it once instead of
+# stat'ing and reading the file on every navigation
+reload_index_html()
+
+# Let WhiteNoise answer /assets/* before requests reach Flask; it indexes
+# the files once at startup. serve_assets remains the fallback without it.
+ASSETS_DIR = os.path.join(STATIC_DIR, 'assets')
+if HAS_WHITENOISE and os.path.isdir(ASSETS_DIR):
+    app.wsgi_app = WhiteNoise(app.wsgi_app, root=ASSETS_DIR, prefix='assets/', max_age=ASSET_MAX_AGE)
+
+# Behind a proxy that honours X-Sendfile, let it send the static files
+# Flask still serves itself. Off by default: without such a proxy the
+# client would get an empty body.
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
+
+# Templates ship with the image, so compile them once at startup and skip
+# the per-render mtime check (which debug mode would otherwise turn on)
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+for template in ('base.html', 'login.html', 'pin_login.html', 'cart.html', 'search.html'):
+    app.jinja_env.get_template(template)
+
 # ============================================================================
 # Register API v2 Blueprint
 # ============================================================================
 try:
     from api.v2 import api_v2
     app.register_blueprint(api_v2)
-    print(f"API v2 blueprint registered")
+    logger.info("API v2 blueprint registered")
 except ImportError as e:
-    print(f"Warning: Could not load API v2 blueprint: {e}")
-
-# ============================================================================
-# Initialize Database (if available)
-# ============================================================================
-try:
-    from services.db import get_db
-    db = get_db()
-    db.init_db()
-    print("Database initialized")
-except Exception as e:
-    print(f"Warning: Database initialization failed: {e}")
+    logger.warning(f"Could not load API v2 blueprint: {e}")
 
 # ============================================================================
 # Helper Functions (for legacy e-reader routes)
@@ -56,33 +171,72 @@ def call_mcp_tool(tool_name, arguments=None):
     if arguments is None:
         arguments = {}
 
+    mcp_breaker.check()
     try:
-        response = requests.post(
+        response = MCP_SESSION.post(
             f"{MCP_SERVER_URL}/call-tool",
-            json={"name": tool_name, "arguments": arguments},
+            data=encode_tool_call(tool_name, arguments),
+            headers=JSON_HEADERS,
             timeout=10
         )
         response.raise_for_status()
-        result = response.json()
+        mcp_breaker.record_success()
+        result = fastjson.loads(response.content)
 
         # Extract text content from MCP response
         if 'content' in result and len(result['content']) > 0:
             content_text = result['content'][0].get('text', '')
             try:
-                return json.loads(content_text) if content_text else {}
-            except:
+                return fastjson.loads(content_text) if content_text else {}
+            except json.JSONDecodeError:
                 return content_text
         return result
-    except requests.RequestException as e:
-        print(f'Error calling MCP tool {tool_name}: {str(e)}')
+    except (requests.RequestException, json.JSONDecodeError) as e:
+        if is_server_failure(e):
+            mcp_breaker.record_failure()
+        logger.error(f'Error calling MCP tool {tool_name}: {str(e)}')
         raise Exception(f'MCP server error: {str(e)}')
 
+def call_mcp_tool_cached(tool_name, arguments=None, ttl=0):
+    """Call an MCP tool, reusing a result cached within the last ttl seconds.
+
+    Uses the same cache keys as MCPClient.call_tool_cached, so results are
+    shared with the v2 API, and concurrent identical calls share one round
+    trip.
+    """
+    result, _ = get_cache().get_or_load(
+        tool_cache_key(tool_name, arguments),
+        lambda: call_mcp_tool(tool_name, arguments),
+        ttl,
+        keep_stale=False
+    )
+    return result
+
+
+def forget_legacy_cart():
+    """Drop cached carts after the legacy routes change the cart.
+
+    MCP serves one Picnic account, so the v2 API's per-user cart snapshots
+    describe the same cart and are dropped too.
+    """
+    cache = get_cache()
+    cache.delete(tool_cache_key('get_cart'))
+    cache.delete_prefix('cart:')
+
+
+def serve_index_html():
+    """Serve the cached SPA shell, answering 304 when the client has it."""
+    response = Response(INDEX_HTML, mimetype='text/html')
+    response.set_etag(INDEX_HTML_ETAG)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 def login_required(f):
     """Decorator to require login for legacy routes"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not session.get('logged_in'):
-            return redirect(url_for('pin_login'))
+            return redirect(URL_PIN_LOGIN)
         return f(*args, **kwargs)
     return decorated_function
 
@@ -99,32 +253,32 @@ def index():
     if ui_mode == 'ereader':
         # Redirect to legacy e-reader interface
         if session.get('logged_in'):
-            return redirect(url_for('legacy_cart'))
-        return redirect(url_for('pin_login'))
+            return redirect(URL_LEGACY_CART)
+        return redirect(URL_PIN_LOGIN)
 
     # Serve React app
-    if os.path.exists(os.path.join(STATIC_DIR, 'index.html')):
-        return send_from_directory(STATIC_DIR, 'index.html')
+    if INDEX_HTML is not None:
+        return serve_index_html()
 
     # Fallback to legacy if React not built
     if session.get('logged_in'):
-        return redirect(url_for('legacy_cart'))
-    return redirect(url_for('pin_login'))
+        return redirect(URL_LEGACY_CART)
+    return redirect(URL_PIN_LOGIN)
 
 
 @app.route('/app')
 @app.route('/app/<path:path>')
 def serve_spa(path=''):
     """Serve React SPA for all app routes"""
-    if os.path.exists(os.path.join(STATIC_DIR, 'index.html')):
-        return send_from_directory(STATIC_DIR, 'index.html')
-    return redirect(url_for('index'))
+    if INDEX_HTML is not None:
+        return serve_index_html()
+    return redirect(URL_INDEX)
 
 
 @app.route('/assets/<path:path>')
 def serve_assets(path):
     """Serve static assets from React build"""
-    return send_from_directory(os.path.join(STATIC_DIR, 'assets'), path)
+    return send_from_directory(ASSETS_DIR, path, max_age=ASSET_MAX_AGE)
 
 
 # ============================================================================
@@ -135,15 +289,15 @@ def serve_assets(path):
 def legacy_index():
     """Legacy home page"""
     if session.get('logged_in'):
-        return redirect(url_for('legacy_cart'))
-    return redirect(url_for('pin_login'))
+        return redirect(URL_LEGACY_CART)
+    return redirect(URL_PIN_LOGIN)
 
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     """Login page - redirects to PIN login for ereader mode"""
     # Redirect to PIN login (the new standard for ereader mode)
-    return redirect(url_for('pin_login'))
+    return redirect(URL_PIN_LOGIN)
 
 
 @app.route('/logout')
@@ -154,14 +308,14 @@ def logout():
     # Check which mode to return to
     ui_mode = request.cookies.get('ui_mode', 'full')
     if ui_mode == 'ereader':
-        return redirect(url_for('pin_login'))
-    return redirect(url_for('index'))
+        return redirect(URL_PIN_LOGIN)
+    return redirect(URL_INDEX)
 
 
 @app.route('/switch-to-full', methods=['GET', 'POST'])
 def switch_to_full_mode():
     """Switch from ereader mode to full mode"""
-    response = make_response(redirect(url_for('index')))
+    response = make_response(redirect(URL_INDEX))
     response.set_cookie('ui_mode', 'full', max_age=31536000)  # 1 year
     session.clear()  # Clear ereader session to require fresh login
     return response
@@ -182,18 +336,9 @@ def pin_login():
             return render_template('pin_login.html')
 
         try:
-            # Get Picnic user ID from MCP server (same as full mode)
-            try:
-                from services.mcp_client import get_mcp_client
-                mcp = get_mcp_client()
-                user_data = mcp.get_user()
-                picnic_user_id = user_data.get('user_id') or user_data.get('id') or 'default'
-            except Exception:
-                picnic_user_id = 'default-user'
-
-            # Verify PIN using the same auth service as full mode
-            auth_service = get_auth_service()
-            result = auth_service.verify_pin(picnic_user_id, pin)
+            # Same (cached) Picnic user ID and auth service as full mode
+            picnic_user_id = get_picnic_user_id()
+            result = get_auth_service().verify_pin(picnic_user_id, pin)
 
             if result.get('valid'):
                 # Set session for ereader mode
@@ -202,15 +347,14 @@ def pin_login():
                 session['picnic_user_id'] = picnic_user_id
 
                 flash('Login successful!', 'success')
-                return redirect(url_for('legacy_cart'))
+                return redirect(URL_LEGACY_CART)
             else:
                 flash('Invalid PIN', 'error')
 
         except ValueError as e:
             flash(str(e), 'error')
         except Exception as e:
-            print(f'PIN login failed: {str(e)}')
-            print(traceback.format_exc())
+            logger.exception(f'PIN login failed: {str(e)}')
             flash(f'Login failed: {str(e)}', 'error')
 
     return render_template('pin_login.html')
@@ -221,13 +365,12 @@ def pin_login():
 def legacy_cart():
     """View shopping cart (legacy e-reader interface)"""
     try:
-        print(f"Fetching cart for user: {session.get('picnic_username')}")
-        cart_data = call_mcp_tool('get_cart')
-        print(f"Cart data retrieved successfully")
+        logger.info(f"Fetching cart for user: {session.get('picnic_username')}")
+        cart_data = call_mcp_tool_cached('get_cart', ttl=LEGACY_CART_TTL)
+        logger.info("Cart data retrieved successfully")
         return render_template('cart.html', cart=cart_data)
     except Exception as e:
-        print(f'Error loading cart: {str(e)}')
-        print(traceback.format_exc())
+        logger.exception(f'Error loading cart: {str(e)}')
         flash(f'Error loading cart: {str(e)}', 'error')
         return render_template('cart.html', cart=None)
 
@@ -239,11 +382,11 @@ def cart():
     """Redirect to legacy cart or React app"""
     ui_mode = request.cookies.get('ui_mode', 'full')
     if ui_mode == 'ereader':
-        return redirect(url_for('legacy_cart'))
+        return redirect(URL_LEGACY_CART)
     # For full mode, React handles /cart route
-    if os.path.exists(os.path.join(STATIC_DIR, 'index.html')):
-        return send_from_directory(STATIC_DIR, 'index.html')
-    return redirect(url_for('legacy_cart'))
+    if INDEX_HTML is not None:
+        return serve_index_html()
+    return redirect(URL_LEGACY_CART)
 
 
 @app.route('/legacy/search')
@@ -251,16 +394,21 @@ def cart():
 def legacy_search():
     """Search for products (legacy e-reader interface)"""
     query = request.args.get('q', '')
-    results = []
+    # Flashed messages (e.g. from a failed add) still need a real render
+    if not query and '_flashes' not in session:
+        return EMPTY_SEARCH_HTML
 
+    results = []
     if query:
         try:
-            print(f"Searching for: {query}")
-            results = call_mcp_tool('search_products', {'query': query})
-            print(f"Found {len(results) if results else 0} results")
+            logger.info(f"Searching for: {query}")
+            results = call_mcp_tool_cached(
+                'search_products', {'query': normalize_query(query)},
+                ttl=MCP_CACHE_TTLS['search_products']
+            )
+            logger.info(f"Found {len(results) if results else 0} results")
         except Exception as e:
-            print(f'Search error: {str(e)}')
-            print(traceback.format_exc())
+            logger.exception(f'Search error: {str(e)}')
             flash(f'Search error: {str(e)}', 'error')
 
     return render_template('search.html', query=query, results=results)
@@ -272,11 +420,11 @@ def legacy_search():
 def search():
     """Redirect to legacy search or React app"""
     ui_mode = request.cookies.get('ui_mode', 'full')
-    if ui_mode == 'ereader':
-        return redirect(url_for('legacy_search', **request.args))
-    if os.path.exists(os.path.join(STATIC_DIR, 'index.html')):
-        return send_from_directory(STATIC_DIR, 'index.html')
-    return redirect(url_for('legacy_search', **request.args))
+    if ui_mode != 'ereader' and INDEX_HTML is not None:
+        return serve_index_html()
+    # Pass the raw query string through rather than rebuilding it from args
+    query_string = request.query_string.decode('latin-1')
+    return redirect(f"{URL_LEGACY_SEARCH}?{query_string}" if query_string else URL_LEGACY_SEARCH)
 
 
 @app.route('/add_to_cart', methods=['POST'])
@@ -287,18 +435,18 @@ def add_to_cart():
     quantity = int(request.form.get('quantity', 1))
 
     try:
-        print(f"Adding product {product_id} (qty: {quantity}) to cart")
+        logger.info(f"Adding product {product_id} (qty: {quantity}) to cart")
         call_mcp_tool('add_to_cart', {'productId': product_id, 'count': quantity})
         flash('Product added to cart!', 'success')
     except Exception as e:
-        print(f'Error adding product: {str(e)}')
-        print(traceback.format_exc())
+        logger.exception(f'Error adding product: {str(e)}')
         flash(f'Error adding product: {str(e)}', 'error')
+    forget_legacy_cart()
 
     # Redirect back to search or cart
     if request.form.get('return_to') == 'search':
-        return redirect(url_for('legacy_search', q=request.form.get('search_query', '')))
-    return redirect(url_for('legacy_cart'))
+        return redirect(f"{URL_LEGACY_SEARCH}?{urlencode({'q': request.form.get('search_query', '')})}")
+    return redirect(URL_LEGACY_CART)
 
 
 @app.route('/remove_from_cart', methods=['POST'])
@@ -309,15 +457,15 @@ def remove_from_cart():
     quantity = int(request.form.get('quantity', 1))
 
     try:
-        print(f"Removing product {product_id} (qty: {quantity}) from cart")
+        logger.info(f"Removing product {product_id} (qty: {quantity}) from cart")
         call_mcp_tool('remove_from_cart', {'productId': product_id, 'count': quantity})
         flash('Product removed from cart', 'success')
     except Exception as e:
-        print(f'Error removing product: {str(e)}')
-        print(traceback.format_exc())
+        logger.exception(f'Error removing product: {str(e)}')
         flash(f'Error removing product: {str(e)}', 'error')
+    forget_legacy_cart()
 
-    return redirect(url_for('legacy_cart'))
+    return redirect(URL_LEGACY_CART)
 
 
 @app.route('/clear_cart', methods=['POST'])
@@ -325,31 +473,53 @@ def remove_from_cart():
 def clear_cart():
     """Clear entire cart (legacy form submission)"""
     try:
-        print("Clearing cart")
+        logger.info("Clearing cart")
         call_mcp_tool('clear_cart')
         flash('Cart cleared', 'success')
     except Exception as e:
-        print(f'Error clearing cart: {str(e)}')
-        print(traceback.format_exc())
+        logger.exception(f'Error clearing cart: {str(e)}')
         flash(f'Error clearing cart: {str(e)}', 'error')
+    forget_legacy_cart()
 
-    return redirect(url_for('legacy_cart'))
+    return redirect(URL_LEGACY_CART)
 
 
 # ============================================================================
 # Utility Routes
 # ============================================================================
 
+# These bodies never change while the process runs, so encode them once
+VERSION_JSON = fastjson.dumps({'version': __version__}).encode()
+HEALTH_JSON = fastjson.dumps({'status': 'ok', 'version': __version__}).encode()
+
+
 @app.route('/version')
 def version():
     """Return application version"""
-    return jsonify({'version': __version__})
+    response = Response(VERSION_JSON, mimetype='application/json')
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
 
 
 @app.route('/health')
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'ok', 'version': __version__})
+    return Response(HEALTH_JSON, mimetype='application/json')
+
+
+# Redirect targets without arguments never change, so resolve them once
+# instead of walking the URL map on every redirect
+with app.test_request_context():
+    URL_INDEX = url_for('index')
+    URL_PIN_LOGIN = url_for('pin_login')
+    URL_LEGACY_CART = url_for('legacy_cart')
+    URL_LEGACY_SEARCH = url_for('legacy_search')
+
+# The search page without a query only depends on being logged in, which
+# login_required guarantees, so render it once
+with app.test_request_context():
+    session['logged_in'] = True
+    EMPTY_SEARCH_HTML = render_template('search.html', query='', results=[])
 
 
 # ============================================================================
@@ -359,8 +529,8 @@ def health():
 @app.errorhandler(404)
 def not_found(e):
     """Handle 404 - serve React app for client-side routing"""
-    if os.path.exists(os.path.join(STATIC_DIR, 'index.html')):
-        return send_from_directory(STATIC_DIR, 'index.html')
+    if INDEX_HTML is not None:
+        return serve_index_html()
     return jsonify({'error': 'Not found'}), 404
 
 
@@ -371,7 +541,13 @@ def not_found(e):
 if __name__ == '__main__':
     host = os.getenv('FLASK_HOST', '0.0.0.0')
     port = int(os.getenv('FLASK_PORT', 5000))
-    print(f"Starting Picnic Cart App v{__version__} on {host}:{port}")
-    print(f"MCP Server URL: {MCP_SERVER_URL}")
-    print(f"Static files: {STATIC_DIR}")
-    app.run(host=host, port=port, debug=True)
+    logger.info(f"Starting Picnic Cart App v{__version__} on {host}:{port}")
+    logger.info(f"MCP Server URL: {MCP_SERVER_URL}")
+    logger.info(f"Static files: {STATIC_DIR}")
+    # Send SIGHUP to pick up a rebuilt frontend without a restart (under
+    # Gunicorn, SIGHUP to the master reloads the workers instead)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, reload_index_html)
+    # One thread per request, so a slow MCP call never blocks other clients
+    # The reloader and debugger stay off; set FLASK_DEBUG=1 for local work
+    app.run(host=host, port=port, debug=os.getenv('FLASK_DEBUG') == '1', threaded=True)
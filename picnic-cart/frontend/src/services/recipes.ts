@@ -24,7 +24,7 @@ interface MatchProductsResponse {
 interface AddToCartResponse {
   added: number
   failed: number
-  cart: unknown
+  cart?: unknown
 }
 
 export async function parseRecipeUrl(url: string): Promise<ParseUrlResponse> {
@@ -0,0 +1,21 @@
+"""Gunicorn settings for running the add-on."""
+
+import os
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', '5000')}"
+
+# A single process keeps the in-process cache, MCP circuit breaker and DB
+# pool shared by every request (unless REDIS_URL is set); its threads serve
+# requests concurrently while they wait on the MCP server.
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+# No preload_app: the app starts its log listener thread at import, and
+# threads don't survive the fork into workers
+
+# Recipe parsing can wait on a page download and a Gemini call in turn
+timeout = 120
+keepalive = 30
+
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
@@ -91,9 +91,9 @@ echo "  - MCP Server: $MCP_SERVER_URL"
 echo "  - Database: $( [ "$DB_ENABLED" = "true" ] && echo "MariaDB ($DB_HOST:$DB_PORT)" || echo "Disabled (in-memory mode)" )"
 echo "  - Default UI Mode: $DEFAULT_UI_MODE"
 echo ""
-echo "Starting Flask application on port 5000..."
+echo "Starting application on port 5000..."
 echo "===================================="
 
-# Start Flask app
+# Start the app under Gunicorn (settings in gunicorn.conf.py)
 cd /app
-exec python3 app.py
+exec gunicorn -c gunicorn.conf.py app:app
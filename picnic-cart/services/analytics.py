@@ -1,15 +1,45 @@
 """Analytics service for order syncing and purchase frequency calculation."""
 
+import sys
+import uuid
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from collections import defaultdict
 
 from .db import get_db
 from .mcp_client import get_mcp_client
+from .cache import get_cache
 
 logger = logging.getLogger(__name__)
 
+# Cache TTLs (seconds) for purchase frequency lookups
+FREQUENCY_CACHE_TTL = 60
+SUGGESTIONS_CACHE_TTL = 30
+
+
+# Keys tried in order for each order item field, covering the different
+# Picnic API response formats
+ITEM_ID_KEYS = ('id', 'product_id', 'article_id')
+ITEM_NAME_KEYS = ('name', 'product_name', 'article_name')
+ITEM_QUANTITY_KEYS = ('quantity', 'count', 'amount')
+ITEM_PRICE_KEYS = ('price', 'unit_price')
+ITEM_IMAGE_KEYS = ('image_url', 'image')
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Intern a repeated string so cached rows share one copy."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _first(data: Dict, keys: Tuple[str, ...], default: Any = None) -> Any:
+    """Return the first truthy value among keys in data, else default."""
+    for key in keys:
+        value = data.get(key)
+        if value:
+            return value
+    return default
+
 
 class AnalyticsService:
     """Service for calculating purchase analytics."""
@@ -17,6 +47,77 @@ class AnalyticsService:
     def __init__(self):
         self.db = get_db()
         self.mcp_client = get_mcp_client()
+        self.cache = get_cache()
+
+    def get_purchase_frequency(
+        self,
+        user_id: str,
+        min_purchases: int = 3,
+        ttl: float = FREQUENCY_CACHE_TTL
+    ) -> Dict[str, Any]:
+        """Get serialized purchase frequency data, cached per user.
+
+        Returns {'products', 'generated_at', 'stale'}; stale is True when the
+        database failed and a previously cached result was returned instead.
+        """
+        def load():
+            products = self.db.get_purchase_frequency(user_id, min_purchases)
+            return {
+                'products': [self._serialize_frequency(p) for p in (products or [])],
+                'generated_at': datetime.utcnow().isoformat()
+            }
+
+        data, stale = self.cache.get_or_load(
+            f"freq:{user_id}:{min_purchases}", load, ttl
+        )
+        return {**data, 'stale': stale}
+
+    def get_due_for_reorder(
+        self,
+        user_id: str,
+        limit: int = 10,
+        ttl: float = SUGGESTIONS_CACHE_TTL
+    ) -> Dict[str, Any]:
+        """Get the most overdue products, cached per user.
+
+        Returns {'products', 'stale'} like get_purchase_frequency.
+        """
+        def load():
+            return [
+                {
+                    'product_id': _intern(row['picnic_product_id']),
+                    'product_name': row['product_name'],
+                    'days_overdue': int(row['days_overdue']),
+                    'avg_days_between': float(row['avg_days_between']),
+                    'confidence': float(row.get('confidence_score') or 0)
+                }
+                for row in self.db.get_due_for_reorder(user_id, limit) or []
+            ]
+
+        # Shares the freq: prefix so recalculation invalidates it too
+        products, stale = self.cache.get_or_load(
+            f"freq:{user_id}:due:{limit}", load, ttl
+        )
+        return {'products': products, 'stale': stale}
+
+    def invalidate_purchase_frequency(self, user_id: str) -> None:
+        """Drop all cached analytics (frequency, suggestions, top products) for a user."""
+        self.cache.delete_prefix(f"freq:{user_id}:")
+
+    @staticmethod
+    def _serialize_frequency(p: Dict) -> Dict:
+        """Convert a purchase_frequency row to a JSON-serializable dict."""
+        return {
+            'product_id': _intern(p.get('picnic_product_id')),
+            'product_name': p.get('product_name'),
+            'total_purchases': p.get('total_purchases'),
+            'total_quantity': p.get('total_quantity'),
+            'first_purchased': p.get('first_purchased').isoformat() if p.get('first_purchased') else None,
+            'last_purchased': p.get('last_purchased').isoformat() if p.get('last_purchased') else None,
+            'avg_days_between': float(p['avg_days_between']) if p.get('avg_days_between') is not None else None,
+            'confidence': float(p.get('confidence_score') or 0),
+            'suggested_frequency': _intern(p.get('suggested_frequency'))
+        }
 
     def sync_orders(self, user_id: str) -> Dict[str, Any]:
         """Sync order history from Picnic API to local cache."""
@@ -36,8 +137,10 @@ class AnalyticsService:
             else:
                 orders = result.get('orders', [])
 
-            synced = 0
-            items_synced = 0
+            # Orders and their (picnic_order_id, item, delivery_time) tuples,
+            # written in one batch each once all orders are collected
+            valid_orders = []
+            order_items = []
 
             for order in orders:
                 order_id = order.get('id') or order.get('delivery_id')
@@ -45,9 +148,7 @@ class AnalyticsService:
                     logger.warning(f"Order without ID: {order.keys() if isinstance(order, dict) else type(order)}")
                     continue
 
-                # Cache the order
-                self.db.cache_order(user_id, order)
-                synced += 1
+                valid_orders.append(order if order.get('id') else {**order, 'id': order_id})
 
                 # Extract delivery time from multiple possible fields
                 delivery_time = (
@@ -58,11 +159,14 @@ class AnalyticsService:
                     order.get('delivery_date')
                 )
 
-                # Extract and cache items
-                items = self._extract_order_items(order)
-                for item in items:
-                    self._cache_order_item(user_id, order_id, item, delivery_time)
-                    items_synced += 1
+                for item in self._extract_order_items(order):
+                    order_items.append((order_id, item, delivery_time))
+
+            # Items reference the cached orders, so those go in first
+            synced = self.db.cache_orders(user_id, valid_orders)
+            self._cache_order_items(user_id, order_items)
+            items_synced = len(order_items)
+            self.invalidate_purchase_frequency(user_id)
 
             logger.info(f"Synced {synced} orders with {items_synced} items")
             return {
@@ -107,79 +211,83 @@ class AnalyticsService:
                 if nested_items and isinstance(nested_items, list) and len(nested_items) > 0:
                     article = nested_items[0]
 
-            # Extract product info with fallbacks for different API response formats
-            product_id = (
-                article.get('id') or
-                article.get('product_id') or
-                article.get('article_id')
-            )
-            product_name = (
-                article.get('name') or
-                article.get('product_name') or
-                article.get('article_name', '')
-            )
-            quantity = (
-                article.get('quantity') or
-                article.get('count') or
-                article.get('amount', 1)
-            )
+            product_id = _first(article, ITEM_ID_KEYS)
+            product_name = _first(article, ITEM_NAME_KEYS, '')
 
             if product_id or product_name:  # Only add if we have at least some info
                 items.append({
                     'id': product_id,
                     'name': product_name,
-                    'quantity': quantity,
-                    'price': article.get('price') or article.get('unit_price'),
+                    'quantity': _first(article, ITEM_QUANTITY_KEYS, 1),
+                    'price': _first(article, ITEM_PRICE_KEYS),
                     'unit_quantity': article.get('unit_quantity'),
-                    'image_url': article.get('image_url') or article.get('image')
+                    'image_url': _first(article, ITEM_IMAGE_KEYS)
                 })
 
         return items
 
-    def _cache_order_item(
+    def _cache_order_items(
         self,
         user_id: str,
-        order_id: str,
-        item: Dict,
-        delivery_date: Optional[str]
+        order_items: List[Tuple[str, Dict, Optional[str]]]
     ) -> None:
-        """Cache an order item for analytics."""
+        """Cache (picnic_order_id, item, delivery_date) tuples for analytics.
+
+        Looks up the cached order UUIDs in one query and inserts all items
+        with a single executemany. Item IDs are derived from the order and
+        product, so syncing the same order again doesn't duplicate its items.
+        """
+        if not order_items:
+            return
+
         with self.db.get_cursor() as cursor:
             if not cursor:
                 return
 
             try:
-                # First get the cached order UUID
+                picnic_order_ids = list(dict.fromkeys(order_id for order_id, _, _ in order_items))
+                placeholders = ', '.join(['%s'] * len(picnic_order_ids))
                 cursor.execute(
-                    "SELECT id FROM order_cache WHERE user_id = %s AND picnic_order_id = %s",
-                    (user_id, order_id)
+                    f"""SELECT id, picnic_order_id FROM order_cache
+                        WHERE user_id = %s AND picnic_order_id IN ({placeholders})""",
+                    (user_id, *picnic_order_ids)
                 )
-                order_row = cursor.fetchone()
-
-                if not order_row:
-                    return
+                order_uuids = {
+                    row['picnic_order_id']: row['id'] for row in cursor.fetchall() or []
+                }
 
-                cursor.execute(
-                    """INSERT IGNORE INTO order_items
-                       (order_id, user_id, picnic_product_id, product_name,
-                        quantity, unit_price, total_price, unit_quantity,
-                        image_url, delivery_date)
-                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                    (
-                        order_row['id'],
+                rows = []
+                for order_id, item, delivery_date in order_items:
+                    order_uuid = order_uuids.get(order_id)
+                    if not order_uuid:
+                        continue
+                    quantity = item.get('quantity', 1)
+                    price = item.get('price')
+                    rows.append((
+                        str(uuid.uuid5(uuid.NAMESPACE_OID, f"{order_uuid}:{item.get('id') or item.get('name')}")),
+                        order_uuid,
                         user_id,
                         item.get('id'),
                         item.get('name'),
-                        item.get('quantity', 1),
-                        item.get('price'),
-                        (item.get('price') or 0) * item.get('quantity', 1),
+                        quantity,
+                        price,
+                        (price or 0) * quantity,
                         item.get('unit_quantity'),
                         item.get('image_url'),
                         delivery_date
+                    ))
+
+                if rows:
+                    cursor.executemany(
+                        """INSERT IGNORE INTO order_items
+                           (id, order_id, user_id, picnic_product_id, product_name,
+                            quantity, unit_price, total_price, unit_quantity,
+                            image_url, delivery_date)
+                           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+                        rows
                     )
-                )
             except Exception as e:
-                logger.warning(f"Failed to cache order item: {e}")
+                logger.warning(f"Failed to cache order items: {e}")
 
     def calculate_purchase_frequency(self, user_id: str) -> Dict[str, Any]:
         """Calculate purchase frequency for all products."""
@@ -188,204 +296,195 @@ class AnalyticsService:
                 return {'calculated': 0, 'error': 'Database not available'}
 
             try:
-                # Get all order items grouped by product
-                # Use GROUP_CONCAT for MariaDB (instead of PostgreSQL's ARRAY_AGG)
+                # One timestamp for the whole run, so the rows written by this
+                # statement can be counted afterwards
+                cursor.execute("SELECT NOW() as now")
+                calculated_at = cursor.fetchone()['now']
+
+                # Per-product purchase stats, with the days between
+                # consecutive purchases computed by LAG and aggregated in SQL;
+                # confidence and the suggested frequency are derived from them
                 cursor.execute(
-                    """SELECT
+                    """INSERT INTO purchase_frequency
+                           (id, user_id, picnic_product_id, product_name,
+                            total_purchases, total_quantity, first_purchased,
+                            last_purchased, avg_days_between, confidence_score,
+                            suggested_frequency, calculated_at)
+                       SELECT
+                           UUID(),
+                           %s,
                            picnic_product_id,
                            product_name,
-                           COUNT(*) as purchase_count,
-                           SUM(quantity) as total_quantity,
-                           MIN(delivery_date) as first_purchased,
-                           MAX(delivery_date) as last_purchased,
-                           GROUP_CONCAT(delivery_date ORDER BY delivery_date SEPARATOR ',') as purchase_dates_str
-                       FROM order_items
-                       WHERE user_id = %s AND delivery_date IS NOT NULL
-                       GROUP BY picnic_product_id, product_name
-                       HAVING COUNT(*) >= 2""",
-                    (user_id,)
+                           purchase_count,
+                           total_quantity,
+                           first_purchased,
+                           last_purchased,
+                           avg_days,
+                           CASE
+                               -- Lower std_dev relative to avg_days = higher confidence
+                               WHEN interval_count > 1 THEN GREATEST(0, 1 - std_dev / (avg_days + 1))
+                               ELSE 0.5
+                           END,
+                           CASE
+                               WHEN avg_days <= 7 THEN 'weekly'
+                               WHEN avg_days <= 14 THEN 'biweekly'
+                               WHEN avg_days <= 30 THEN 'monthly'
+                               ELSE 'occasional'
+                           END,
+                           %s
+                       FROM (
+                           SELECT
+                               picnic_product_id,
+                               product_name,
+                               COUNT(*) as purchase_count,
+                               SUM(quantity) as total_quantity,
+                               MIN(delivery_date) as first_purchased,
+                               MAX(delivery_date) as last_purchased,
+                               COUNT(days_between) as interval_count,
+                               AVG(days_between) as avg_days,
+                               STDDEV_POP(days_between) as std_dev
+                           FROM (
+                               SELECT
+                                   picnic_product_id,
+                                   product_name,
+                                   quantity,
+                                   delivery_date,
+                                   TIMESTAMPDIFF(DAY, LAG(delivery_date) OVER (
+                                       PARTITION BY picnic_product_id, product_name
+                                       ORDER BY delivery_date
+                                   ), delivery_date) as days_between
+                               FROM order_items
+                               WHERE user_id = %s AND delivery_date IS NOT NULL
+                           ) purchases
+                           GROUP BY picnic_product_id, product_name
+                           HAVING COUNT(*) >= 2
+                       ) stats
+                       ON DUPLICATE KEY UPDATE
+                           product_name = VALUES(product_name),
+                           total_purchases = VALUES(total_purchases),
+                           total_quantity = VALUES(total_quantity),
+                           last_purchased = VALUES(last_purchased),
+                           avg_days_between = VALUES(avg_days_between),
+                           confidence_score = VALUES(confidence_score),
+                           suggested_frequency = VALUES(suggested_frequency),
+                           calculated_at = VALUES(calculated_at)""",
+                    (user_id, calculated_at, user_id)
                 )
-                products = cursor.fetchall()
-
-                calculated = 0
-                for product in products:
-                    # Parse GROUP_CONCAT result (comma-separated dates string)
-                    dates_str = product.get('purchase_dates_str', '')
-                    dates = []
-                    if dates_str:
-                        for date_part in dates_str.split(','):
-                            date_part = date_part.strip()
-                            if date_part:
-                                try:
-                                    # Try to parse as date string or datetime
-                                    if isinstance(date_part, str):
-                                        dates.append(datetime.fromisoformat(date_part.replace(' ', 'T').split('.')[0]))
-                                    else:
-                                        dates.append(date_part)
-                                except (ValueError, TypeError):
-                                    continue
-
-                    if len(dates) >= 2:
-                        # Calculate average days between purchases
-                        intervals = []
-                        for i in range(1, len(dates)):
-                            if dates[i] and dates[i-1]:
-                                delta = dates[i] - dates[i-1]
-                                intervals.append(delta.days)
-
-                        if intervals:
-                            avg_days = sum(intervals) / len(intervals)
-
-                            # Calculate confidence based on consistency
-                            if len(intervals) > 1:
-                                variance = sum((x - avg_days) ** 2 for x in intervals) / len(intervals)
-                                std_dev = variance ** 0.5
-                                # Lower std_dev relative to avg_days = higher confidence
-                                confidence = max(0, 1 - (std_dev / (avg_days + 1)))
-                            else:
-                                confidence = 0.5
-
-                            # Determine suggested frequency
-                            if avg_days <= 7:
-                                suggested = 'weekly'
-                            elif avg_days <= 14:
-                                suggested = 'biweekly'
-                            elif avg_days <= 30:
-                                suggested = 'monthly'
-                            else:
-                                suggested = 'occasional'
-
-                            # Update purchase_frequency table (MariaDB syntax)
-                            cursor.execute(
-                                """INSERT INTO purchase_frequency
-                                   (user_id, picnic_product_id, product_name,
-                                    total_purchases, total_quantity, first_purchased,
-                                    last_purchased, avg_days_between, confidence_score,
-                                    suggested_frequency, calculated_at)
-                                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
-                                   ON DUPLICATE KEY UPDATE
-                                       product_name = VALUES(product_name),
-                                       total_purchases = VALUES(total_purchases),
-                                       total_quantity = VALUES(total_quantity),
-                                       last_purchased = VALUES(last_purchased),
-                                       avg_days_between = VALUES(avg_days_between),
-                                       confidence_score = VALUES(confidence_score),
-                                       suggested_frequency = VALUES(suggested_frequency),
-                                       calculated_at = NOW()""",
-                                (
-                                    user_id,
-                                    product['picnic_product_id'],
-                                    product['product_name'],
-                                    product['purchase_count'],
-                                    product['total_quantity'],
-                                    product['first_purchased'],
-                                    product['last_purchased'],
-                                    avg_days,
-                                    confidence,
-                                    suggested
-                                )
-                            )
-                            calculated += 1
 
+                # Affected-row counts double up on updates, so count directly
+                cursor.execute(
+                    """SELECT COUNT(*) as calculated FROM purchase_frequency
+                       WHERE user_id = %s AND calculated_at = %s""",
+                    (user_id, calculated_at)
+                )
+                calculated = cursor.fetchone()['calculated']
+
+                self.invalidate_purchase_frequency(user_id)
                 return {
                     'calculated': calculated,
-                    'total_products': len(products)
+                    'total_products': calculated
                 }
 
             except Exception as e:
                 logger.error(f"Failed to calculate purchase frequency: {e}")
                 return {'calculated': 0, 'error': str(e)}
 
-    def get_top_products(self, user_id: str, limit: int = 20) -> List[Dict]:
-        """Get top purchased products."""
-        with self.db.get_cursor() as cursor:
-            if not cursor:
-                return []
-
-            cursor.execute(
-                """SELECT
-                       picnic_product_id,
-                       product_name,
-                       SUM(quantity) as total_quantity,
-                       COUNT(*) as order_count,
-                       MAX(delivery_date) as last_ordered
-                   FROM order_items
-                   WHERE user_id = %s
-                   GROUP BY picnic_product_id, product_name
-                   ORDER BY total_quantity DESC
-                   LIMIT %s""",
-                (user_id, limit)
-            )
-            return cursor.fetchall() or []
-
-    def get_spending_by_category(self, user_id: str, months: int = 6) -> List[Dict]:
-        """Get spending breakdown by category."""
-        with self.db.get_cursor() as cursor:
-            if not cursor:
-                return []
-
-            cursor.execute(
-                """SELECT
-                       COALESCE(category, 'Other') as category,
-                       SUM(total_price) as total_spent,
-                       COUNT(*) as item_count
-                   FROM order_items
-                   WHERE user_id = %s
-                     AND delivery_date >= DATE_SUB(NOW(), INTERVAL %s MONTH)
-                   GROUP BY category
-                   ORDER BY total_spent DESC""",
-                (user_id, months)
-            )
-            return cursor.fetchall() or []
-
-    def suggest_recurring_list(self, user_id: str) -> Dict[str, Any]:
-        """Suggest items for a recurring shopping list."""
-        with self.db.get_cursor() as cursor:
-            if not cursor:
-                return {'items': []}
-
-            # Get products with high purchase frequency and consistency
-            cursor.execute(
-                """SELECT
-                       picnic_product_id,
-                       product_name,
-                       total_purchases,
-                       avg_days_between,
-                       confidence_score,
-                       suggested_frequency
-                   FROM purchase_frequency
-                   WHERE user_id = %s
-                     AND confidence_score >= 0.6
-                     AND total_purchases >= 3
-                   ORDER BY confidence_score DESC, total_purchases DESC
-                   LIMIT 20""",
-                (user_id,)
-            )
-
-            weekly = []
-            biweekly = []
-            monthly = []
-
-            for row in cursor.fetchall() or []:
-                item = {
-                    'product_id': row['picnic_product_id'],
-                    'product_name': row['product_name'],
-                    'avg_days': float(row['avg_days_between']),
-                    'confidence': float(row['confidence_score'])
-                }
+    def get_top_products(
+        self,
+        user_id: str,
+        limit: int = 20,
+        ttl: float = FREQUENCY_CACHE_TTL
+    ) -> List[Dict]:
+        """Get top purchased products as JSON-serializable dicts, cached per user."""
+        def load():
+            with self.db.get_cursor() as cursor:
+                if not cursor:
+                    return []
 
-                if row['suggested_frequency'] == 'weekly':
-                    weekly.append(item)
-                elif row['suggested_frequency'] == 'biweekly':
-                    biweekly.append(item)
-                elif row['suggested_frequency'] == 'monthly':
-                    monthly.append(item)
+                cursor.execute(
+                    """SELECT
+                           picnic_product_id,
+                           MAX(product_name) as product_name,
+                           SUM(quantity) as total_quantity,
+                           COUNT(*) as order_count,
+                           MAX(delivery_date) as last_ordered
+                       FROM order_items
+                       WHERE user_id = %s
+                       GROUP BY picnic_product_id
+                       ORDER BY total_quantity DESC
+                       LIMIT %s""",
+                    (user_id, limit)
+                )
+                return [
+                    {
+                        'product_id': _intern(row['picnic_product_id']),
+                        'product_name': row['product_name'],
+                        'total_quantity': int(row['total_quantity'] or 0),
+                        'order_count': row['order_count'],
+                        'last_ordered': row['last_ordered'].isoformat() if row['last_ordered'] else None
+                    }
+                    for row in cursor.fetchall() or []
+                ]
+
+        products, _ = self.cache.get_or_load(f"freq:{user_id}:top:{limit}", load, ttl)
+        return products
+
+    def suggest_recurring_list(
+        self,
+        user_id: str,
+        ttl: float = SUGGESTIONS_CACHE_TTL
+    ) -> Dict[str, Any]:
+        """Suggest items for a recurring shopping list, cached per user."""
+        def load():
+            with self.db.get_cursor() as cursor:
+                if not cursor:
+                    return {'items': []}
+
+                # Get products with high purchase frequency and consistency
+                cursor.execute(
+                    """SELECT
+                           picnic_product_id,
+                           product_name,
+                           total_purchases,
+                           avg_days_between,
+                           confidence_score,
+                           suggested_frequency
+                       FROM purchase_frequency
+                       WHERE user_id = %s
+                         AND confidence_score >= 0.6
+                         AND total_purchases >= 3
+                       ORDER BY confidence_score DESC, total_purchases DESC
+                       LIMIT 20""",
+                    (user_id,)
+                )
 
-            return {
-                'weekly': weekly,
-                'biweekly': biweekly,
-                'monthly': monthly
-            }
+                weekly = []
+                biweekly = []
+                monthly = []
+
+                for row in cursor.fetchall() or []:
+                    item = {
+                        'product_id': row['picnic_product_id'],
+                        'product_name': row['product_name'],
+                        'avg_days': float(row['avg_days_between']),
+                        'confidence': float(row['confidence_score'])
+                    }
+
+                    if row['suggested_frequency'] == 'weekly':
+                        weekly.append(item)
+                    elif row['suggested_frequency'] == 'biweekly':
+                        biweekly.append(item)
+                    elif row['suggested_frequency'] == 'monthly':
+                        monthly.append(item)
+
+                return {
+                    'weekly': weekly,
+                    'biweekly': biweekly,
+                    'monthly': monthly
+                }
+
+        suggestions, _ = self.cache.get_or_load(f"freq:{user_id}:recurring", load, ttl)
+        return suggestions
 
 
 # Global instance
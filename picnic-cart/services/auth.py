@@ -12,6 +12,7 @@ import jwt
 from flask import request, g, jsonify
 
 from .db import get_db
+from .cache import get_cache
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,8 @@ TOKEN_EXPIRY_HOURS = int(os.getenv('JWT_EXPIRY_HOURS', '24'))
 TOKEN_EXPIRY_MINUTES = TOKEN_EXPIRY_HOURS * 60
 PIN_ATTEMPTS_LIMIT = 5
 PIN_LOCKOUT_MINUTES = 15
+# How long a validated session is trusted before re-checking the database
+SESSION_CACHE_TTL = 300
 
 
 class AuthService:
@@ -28,6 +31,7 @@ class AuthService:
 
     def __init__(self):
         self.db = get_db()
+        self.cache = get_cache()
 
     def setup_pin(self, picnic_user_id: str, pin: str) -> Dict:
         """Set up or update PIN for a user."""
@@ -45,6 +49,7 @@ class AuthService:
         expires_at = datetime.utcnow() + timedelta(minutes=TOKEN_EXPIRY_MINUTES)
 
         self.db.update_user_token(str(user['id']), token, expires_at)
+        self._forget_sessions(str(user['id']))
 
         return {
             'success': True,
@@ -62,13 +67,14 @@ class AuthService:
         if not user.get('pin_hash'):
             raise ValueError("PIN not set up. Please set up PIN first.")
 
-        # Check rate limiting
-        if self._is_locked_out(str(user['id'])):
+        # Check rate limiting; the count is reused for the remaining attempts
+        attempts = self.db.get_recent_failed_attempts(str(user['id']), PIN_LOCKOUT_MINUTES)
+        if attempts >= PIN_ATTEMPTS_LIMIT:
             raise ValueError(f"Too many attempts. Try again in {PIN_LOCKOUT_MINUTES} minutes.")
 
         if not bcrypt.checkpw(pin.encode(), user['pin_hash'].encode()):
             self.db.record_failed_attempt(str(user['id']))
-            remaining = PIN_ATTEMPTS_LIMIT - self.db.get_recent_failed_attempts(str(user['id']), PIN_LOCKOUT_MINUTES)
+            remaining = PIN_ATTEMPTS_LIMIT - attempts - 1
             raise ValueError(f"Invalid PIN. {remaining} attempts remaining.")
 
         # Clear failed attempts on success
@@ -78,6 +84,7 @@ class AuthService:
         expires_at = datetime.utcnow() + timedelta(minutes=TOKEN_EXPIRY_MINUTES)
 
         self.db.update_user_token(str(user['id']), token, expires_at)
+        self._forget_sessions(str(user['id']))
 
         return {
             'valid': True,
@@ -99,6 +106,11 @@ class AuthService:
             if not user_id:
                 return {'valid': False, 'reason': 'invalid_payload'}
 
+            cache_key = f"sess:{user_id}:{token}"
+            cached_user = self.cache.get(cache_key)
+            if cached_user is not None:
+                return {'valid': True, 'user': cached_user}
+
             user = self.db.get_user_by_id(user_id)
             if not user:
                 return {'valid': False, 'reason': 'user_not_found'}
@@ -109,14 +121,14 @@ class AuthService:
             if user.get('token_expires_at') and user['token_expires_at'] < datetime.utcnow():
                 return {'valid': False, 'reason': 'expired'}
 
-            return {
-                'valid': True,
-                'user': {
-                    'id': str(user['id']),
-                    'display_name': user.get('display_name'),
-                    'picnic_user_id': user['picnic_user_id']
-                }
+            user_info = {
+                'id': str(user['id']),
+                'display_name': user.get('display_name'),
+                'picnic_user_id': user['picnic_user_id']
             }
+            self.cache.set(cache_key, user_info, SESSION_CACHE_TTL)
+
+            return {'valid': True, 'user': user_info}
 
         except jwt.ExpiredSignatureError:
             return {'valid': False, 'reason': 'expired'}
@@ -149,6 +161,7 @@ class AuthService:
     def logout(self, user_id: str) -> None:
         """Invalidate user's session."""
         self.db.update_user_token(user_id, '', datetime.utcnow())
+        self._forget_sessions(user_id)
 
     def refresh_token_if_active(self, token: str) -> Optional[str]:
         """Extend token expiry if user is active."""
@@ -168,10 +181,15 @@ class AuthService:
                 new_token = self._generate_token(str(user['id']))
                 new_expires = datetime.utcnow() + timedelta(minutes=TOKEN_EXPIRY_MINUTES)
                 self.db.update_user_token(str(user['id']), new_token, new_expires)
+                self._forget_sessions(str(user['id']))
                 return new_token
 
         return token
 
+    def _forget_sessions(self, user_id: str) -> None:
+        """Drop cached session lookups after a user's token changes."""
+        self.cache.delete_prefix(f"sess:{user_id}:")
+
     def _generate_token(self, user_id: str) -> str:
         """Generate a JWT token."""
         payload = {
@@ -186,15 +204,17 @@ class AuthService:
         """Validate PIN format (4-6 digits)."""
         return pin.isdigit() and 4 <= len(pin) <= 6
 
-    def _is_locked_out(self, user_id: str) -> bool:
-        """Check if user is locked out due to failed attempts."""
-        attempts = self.db.get_recent_failed_attempts(user_id, PIN_LOCKOUT_MINUTES)
-        return attempts >= PIN_ATTEMPTS_LIMIT
+
+# Global instance
+_auth_service = None
 
 
 def get_auth_service() -> AuthService:
-    """Get auth service instance."""
-    return AuthService()
+    """Get the auth service singleton."""
+    global _auth_service
+    if _auth_service is None:
+        _auth_service = AuthService()
+    return _auth_service
 
 
 def require_auth(f):
@@ -0,0 +1,214 @@
+"""Short-lived cache for expensive database and MCP lookups."""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import redis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
+from . import fastjson
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+REDIS_URL = os.getenv('REDIS_URL', '')
+# How long an expired entry is kept around to serve as a stale fallback
+CACHE_STALE_SECONDS = int(os.getenv('CACHE_STALE_SECONDS', '3600'))
+# How often expired in-process entries are swept out (seconds)
+CACHE_SWEEP_INTERVAL = 60
+# Max entries held by the in-process cache; least recently used go first
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '2048'))
+
+
+class CacheService:
+    """Key/value cache backed by Redis when configured, in-process otherwise.
+
+    Entries are stored together with the time they were generated so callers
+    can decide how fresh a value must be, and so an expired value can still be
+    served when the underlying source is failing.
+    """
+
+    def __init__(self):
+        self._redis = None
+        if HAS_REDIS and REDIS_URL:
+            try:
+                self._redis = redis.Redis.from_url(REDIS_URL)
+                self._redis.ping()
+                logger.info("Using Redis cache")
+            except Exception as e:
+                logger.warning(f"Redis unavailable, using in-process cache: {e}")
+                self._redis = None
+        self._store: 'OrderedDict[str, Tuple[float, Dict]]' = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-key locks so concurrent misses run a loader only once
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._load_locks_guard = threading.Lock()
+        self._next_sweep = time.time() + CACHE_SWEEP_INTERVAL
+
+    def get_entry(self, key: str) -> Optional[Dict]:
+        """Get the raw entry ({'value', 'generated_at', 'ttl'}) for a key."""
+        if self._redis is not None:
+            try:
+                raw = self._redis.hgetall(key)
+            except Exception as e:
+                logger.warning(f"Cache read failed for {key}: {e}")
+                return None
+            if not raw:
+                return None
+            return {
+                'value': fastjson.loads(raw[b'value']),
+                'generated_at': float(raw[b'generated_at']),
+                'ttl': float(raw[b'ttl']),
+            }
+
+        with self._lock:
+            item = self._store.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.time():
+                del self._store[key]
+                return None
+            self._store.move_to_end(key)
+            return entry
+
+    def get(self, key: str) -> Any:
+        """Get a cached value, or None if missing or expired."""
+        entry = self.get_entry(key)
+        if entry and time.time() - entry['generated_at'] < entry['ttl']:
+            return entry['value']
+        return None
+
+    def set(self, key: str, value: Any, ttl: float, keep_stale: bool = True) -> None:
+        """Cache a JSON-serializable value for ttl seconds.
+
+        Unless keep_stale is False, the entry is kept longer so it can serve
+        as a stale fallback in get_or_load.
+        """
+        now = time.time()
+        retention = max(ttl, CACHE_STALE_SECONDS) if keep_stale else ttl
+
+        if self._redis is not None:
+            # Outside the try: values must be plain JSON so both backends
+            # return the same types, and anything else is a caller bug
+            encoded = fastjson.dumps(value)
+            try:
+                pipe = self._redis.pipeline()
+                pipe.hset(key, mapping={
+                    'value': encoded,
+                    'generated_at': now,
+                    'ttl': ttl,
+                })
+                pipe.expire(key, int(retention))
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Cache write failed for {key}: {e}")
+            return
+
+        with self._lock:
+            self._store[key] = (now + retention, {
+                'value': value,
+                'generated_at': now,
+                'ttl': ttl,
+            })
+            self._store.move_to_end(key)
+            if now >= self._next_sweep:
+                self._sweep(now)
+            while len(self._store) > CACHE_MAX_ENTRIES:
+                self._store.popitem(last=False)
+
+    def _sweep(self, now: float) -> None:
+        """Drop expired in-process entries. Caller must hold the lock."""
+        for key in [k for k, (expires_at, _) in self._store.items() if expires_at < now]:
+            del self._store[key]
+        self._next_sweep = now + CACHE_SWEEP_INTERVAL
+
+    def delete(self, key: str) -> None:
+        """Remove a key from the cache."""
+        if self._redis is not None:
+            try:
+                self._redis.delete(key)
+            except Exception as e:
+                logger.warning(f"Cache delete failed for {key}: {e}")
+            return
+
+        with self._lock:
+            self._store.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        """Remove all keys starting with prefix."""
+        if self._redis is not None:
+            try:
+                keys = list(self._redis.scan_iter(match=f"{prefix}*"))
+                if keys:
+                    self._redis.delete(*keys)
+            except Exception as e:
+                logger.warning(f"Cache delete failed for {prefix}*: {e}")
+            return
+
+        with self._lock:
+            for key in [k for k in self._store if k.startswith(prefix)]:
+                del self._store[key]
+
+    def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Any],
+        ttl: float,
+        keep_stale: bool = True
+    ) -> Tuple[Any, bool]:
+        """Return (value, stale), calling loader on a miss.
+
+        If the loader raises and an expired entry is still available, that
+        entry is returned with stale=True instead of propagating the error.
+        Concurrent misses on the same key in this process wait for a single
+        loader call and reuse its result. keep_stale is passed on to set().
+        """
+        entry = self.get_entry(key)
+        if entry and time.time() - entry['generated_at'] < ttl:
+            return entry['value'], False
+
+        with self._load_locks_guard:
+            lock = self._load_locks.setdefault(key, threading.Lock())
+
+        try:
+            with lock:
+                # Another thread may have loaded it while we waited
+                entry = self.get_entry(key)
+                if entry and time.time() - entry['generated_at'] < ttl:
+                    return entry['value'], False
+
+                try:
+                    value = loader()
+                except Exception as e:
+                    if entry is None:
+                        raise
+                    logger.warning(f"Serving stale cache for {key}: {e}")
+                    return entry['value'], True
+
+                self.set(key, value, ttl, keep_stale=keep_stale)
+                return value, False
+        finally:
+            with self._load_locks_guard:
+                if self._load_locks.get(key) is lock:
+                    del self._load_locks[key]
+
+
+# Global instance
+_cache = None
+
+
+def get_cache() -> CacheService:
+    """Get the cache service singleton."""
+    global _cache
+    if _cache is None:
+        _cache = CacheService()
+    return _cache
+
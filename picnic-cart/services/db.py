@@ -1,8 +1,10 @@
 """Database service for MariaDB connection and operations."""
 
 import os
+import uuid
+import queue
 import logging
-import json
+import threading
 from contextlib import contextmanager
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
@@ -14,8 +16,13 @@ try:
 except ImportError:
     HAS_MARIADB = False
 
+from . import fastjson
+
 logger = logging.getLogger(__name__)
 
+# Max idle connections kept open for reuse
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+
 
 class DatabaseService:
     """MariaDB database service for Home Assistant MariaDB addon."""
@@ -31,7 +38,35 @@ class DatabaseService:
             'charset': 'utf8mb4',
             'cursorclass': DictCursor if HAS_MARIADB else None,
         }
-        self._connection = None
+        self._pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        # Thread currently running init_db, which re-enters via get_cursor
+        self._schema_owner = None
+
+    def _acquire_connection(self):
+        """Take an idle pooled connection, or open a new one."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            return pymysql.connect(**self.connection_params)
+
+        try:
+            conn.ping(reconnect=True)
+            return conn
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return pymysql.connect(**self.connection_params)
+
+    def _release_connection(self, conn) -> None:
+        """Return a connection to the pool, closing it if the pool is full."""
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
 
     @contextmanager
     def get_cursor(self):
@@ -45,21 +80,45 @@ class DatabaseService:
             yield None
             return
 
-        conn = None
+        self.ensure_schema()
+        conn = self._acquire_connection()
+        reusable = True
         try:
-            conn = pymysql.connect(**self.connection_params)
             cursor = conn.cursor()
             yield cursor
+            cursor.close()
             conn.commit()
         except Exception as e:
-            if conn:
+            try:
                 conn.rollback()
+            except Exception:
+                reusable = False
             logger.error(f"Database error: {e}")
             raise
         finally:
-            if conn:
+            if reusable:
+                self._release_connection(conn)
+            else:
                 conn.close()
 
+    def ensure_schema(self) -> None:
+        """Run init_db once, on first database use instead of at startup.
+
+        Other threads wait until the schema is in place. A failed attempt
+        (e.g. MariaDB not up yet) is retried on the next use.
+        """
+        if self._schema_ready or self._schema_owner == threading.get_ident():
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            self._schema_owner = threading.get_ident()
+            try:
+                self.init_db()
+                self._schema_ready = True
+            finally:
+                self._schema_owner = None
+
     def init_db(self):
         """Initialize database with schema - creates tables if they don't exist."""
         if not HAS_MARIADB:
@@ -250,6 +309,29 @@ class DatabaseService:
 
             return lists
 
+    def get_recurring_list_by_id(self, user_id: str, list_id: str) -> Optional[Dict]:
+        """Get a single recurring list (with items) owned by a user."""
+        with self.get_cursor() as cursor:
+            if not cursor:
+                return None
+            cursor.execute(
+                """SELECT * FROM recurring_lists
+                   WHERE id = %s AND user_id = %s AND is_active = 1""",
+                (list_id, user_id)
+            )
+            lst = cursor.fetchone()
+            if not lst:
+                return None
+
+            cursor.execute(
+                """SELECT * FROM recurring_list_items
+                   WHERE list_id = %s
+                   ORDER BY sort_order""",
+                (lst['id'],)
+            )
+            lst['items'] = cursor.fetchall()
+            return lst
+
     def create_recurring_list(self, user_id: str, data: Dict) -> Dict:
         """Create a new recurring list."""
         with self.get_cursor() as cursor:
@@ -282,31 +364,49 @@ class DatabaseService:
 
     def cache_order(self, user_id: str, order_data: Dict) -> None:
         """Cache an order for analytics."""
+        self.cache_orders(user_id, [order_data])
+
+    def cache_orders(self, user_id: str, orders: List[Dict]) -> int:
+        """Cache several orders in one multi-row upsert and transaction.
+
+        Returns the number of orders written.
+        """
+        rows = [
+            (
+                str(uuid.uuid4()),
+                user_id,
+                order_data['id'],
+                order_data.get('status'),
+                order_data.get('delivery_date'),
+                order_data.get('delivery_slot_start'),
+                order_data.get('delivery_slot_end'),
+                order_data.get('total_price'),
+                order_data.get('total_items'),
+                fastjson.dumps(order_data)
+            )
+            for order_data in orders
+        ]
+        if not rows:
+            return 0
+
         with self.get_cursor() as cursor:
             if not cursor:
-                return
-            cursor.execute(
+                return 0
+            # Only plain placeholders in VALUES, so PyMySQL can send all rows
+            # as a single multi-row INSERT
+            cursor.executemany(
                 """INSERT INTO order_cache
                    (id, user_id, picnic_order_id, order_status, delivery_date,
                     delivery_slot_start, delivery_slot_end, total_price,
-                    total_items, order_data, created_at, synced_at)
-                   VALUES (UUID(), %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+                    total_items, order_data)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                    ON DUPLICATE KEY UPDATE
                        order_status = VALUES(order_status),
                        order_data = VALUES(order_data),
                        synced_at = NOW()""",
-                (
-                    user_id,
-                    order_data['id'],
-                    order_data.get('status'),
-                    order_data.get('delivery_date'),
-                    order_data.get('delivery_slot_start'),
-                    order_data.get('delivery_slot_end'),
-                    order_data.get('total_price'),
-                    order_data.get('total_items'),
-                    json.dumps(order_data)
-                )
+                rows
             )
+            return len(rows)
 
     def get_purchase_frequency(self, user_id: str, min_purchases: int = 3) -> List[Dict]:
         """Get purchase frequency data for a user."""
@@ -321,27 +421,91 @@ class DatabaseService:
             )
             return cursor.fetchall()
 
-    def get_monthly_spending(self, user_id: str, months: int = 6) -> List[Dict]:
-        """Get monthly spending summary."""
+    def get_due_for_reorder(
+        self,
+        user_id: str,
+        limit: int = 10,
+        min_purchases: int = 3
+    ) -> List[Dict]:
+        """Get the most overdue products, based on their average reorder interval.
+
+        Each row carries days_overdue: whole days past last_purchased plus
+        avg_days_between (timestamps are stored in UTC).
+        """
         with self.get_cursor() as cursor:
             if not cursor:
                 return []
             cursor.execute(
                 """SELECT
-                       user_id,
-                       DATE_FORMAT(delivery_date, '%%Y-%%m-01') AS month,
-                       COUNT(*) AS order_count,
-                       SUM(total_price) AS total_spent,
-                       SUM(total_items) AS total_items
-                   FROM order_cache
-                   WHERE user_id = %s AND order_status = 'COMPLETED'
-                   GROUP BY user_id, DATE_FORMAT(delivery_date, '%%Y-%%m-01')
-                   ORDER BY month DESC
+                       picnic_product_id,
+                       product_name,
+                       avg_days_between,
+                       confidence_score,
+                       FLOOR(
+                           (TIMESTAMPDIFF(SECOND, last_purchased, UTC_TIMESTAMP())
+                            - avg_days_between * 86400) / 86400
+                       ) AS days_overdue
+                   FROM purchase_frequency
+                   WHERE user_id = %s
+                     AND total_purchases >= %s
+                     AND avg_days_between > 0
+                     AND TIMESTAMPDIFF(SECOND, last_purchased, UTC_TIMESTAMP()) > avg_days_between * 86400
+                   ORDER BY days_overdue DESC
                    LIMIT %s""",
-                (user_id, months)
+                (user_id, min_purchases, limit)
             )
             return cursor.fetchall()
 
+    def get_spending_summary(self, user_id: str, months: int = 6) -> Dict[str, List[Dict]]:
+        """Get monthly spending and category breakdown in a single query.
+
+        Returns {'monthly': [...], 'categories': [...]}; monthly rows are the
+        last `months` months with completed orders, newest first, and
+        category rows cover order items delivered in the last `months` months,
+        highest spend first.
+        """
+        with self.get_cursor() as cursor:
+            if not cursor:
+                return {'monthly': [], 'categories': []}
+            cursor.execute(
+                """(SELECT
+                        'month' AS kind,
+                        DATE_FORMAT(delivery_date, '%%Y-%%m-01') AS label,
+                        COUNT(*) AS order_count,
+                        SUM(total_price) AS total_spent,
+                        SUM(total_items) AS item_count
+                    FROM order_cache
+                    WHERE user_id = %s AND order_status = 'COMPLETED'
+                    GROUP BY DATE_FORMAT(delivery_date, '%%Y-%%m-01')
+                    ORDER BY label DESC
+                    LIMIT %s)
+                   UNION ALL
+                   (SELECT
+                        'category' AS kind,
+                        COALESCE(category, 'Other') AS label,
+                        NULL AS order_count,
+                        SUM(total_price) AS total_spent,
+                        COUNT(*) AS item_count
+                    FROM order_items
+                    WHERE user_id = %s
+                      AND delivery_date >= DATE_SUB(NOW(), INTERVAL %s MONTH)
+                    GROUP BY category)""",
+                (user_id, months, user_id, months)
+            )
+            rows = cursor.fetchall()
+
+        monthly = sorted(
+            (r for r in rows if r['kind'] == 'month'),
+            key=lambda r: r['label'] or '',
+            reverse=True
+        )
+        categories = sorted(
+            (r for r in rows if r['kind'] == 'category'),
+            key=lambda r: r['total_spent'] or 0,
+            reverse=True
+        )
+        return {'monthly': monthly, 'categories': categories}
+
 
 # Global instance
 _db = None
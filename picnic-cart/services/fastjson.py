@@ -0,0 +1,31 @@
+"""JSON encoding/decoding backed by orjson when available."""
+
+import json
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+if HAS_ORJSON:
+    # Datetimes go through `default` so output matches the stdlib path
+    _OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def loads(data) -> Any:
+    """Parse JSON from str or bytes.
+
+    Errors are raised as json.JSONDecodeError (orjson's error subclasses it).
+    """
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, default: Optional[Callable] = None) -> str:
+    """Serialize obj to a JSON string."""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, default=default, option=_OPTIONS).decode()
+    return json.dumps(obj, default=default)
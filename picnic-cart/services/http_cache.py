@@ -0,0 +1,124 @@
+"""HTTP caching, compression and streaming helpers for API responses."""
+
+import gzip
+import zlib
+from functools import wraps
+
+from flask import request, make_response, current_app, Response
+
+# Responses smaller than this aren't worth compressing (bytes)
+COMPRESS_MIN_SIZE = 1024
+# gzip level; mid-range keeps CPU cost low on small add-on hosts
+COMPRESS_LEVEL = 5
+
+
+def conditional(f):
+    """Decorator adding an ETag to GET responses and answering 304 on a match.
+
+    Clients that poll an endpoint send back the ETag in If-None-Match and get
+    an empty 304 when the payload has not changed.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        response = make_response(f(*args, **kwargs))
+
+        if request.method == 'GET' and response.status_code == 200:
+            response.add_etag()
+            response.make_conditional(request)
+
+        return response
+
+    return decorated
+
+
+def cacheable(ttl: int = 30, scope: str = 'private'):
+    """Decorator setting Cache-Control and Vary headers on GET responses.
+
+    Responses vary by Authorization and Cookie so per-user data is never
+    shared between clients. A ttl of 0 lets clients store the response but
+    revalidate it on every use (cheap when combined with @conditional).
+    """
+    if ttl > 0:
+        cache_control = f"{scope}, max-age={ttl}"
+    else:
+        cache_control = f"{scope}, no-cache"
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            response = make_response(f(*args, **kwargs))
+
+            if request.method == 'GET' and response.status_code in (200, 304):
+                response.headers['Cache-Control'] = cache_control
+                response.vary.update(('Authorization', 'Cookie'))
+
+            return response
+
+        return decorated
+
+    return decorator
+
+
+def stream_json_list(key: str, items, **fields) -> Response:
+    """Stream {key: [items...], **fields} as JSON, one item at a time.
+
+    The body is encoded and sent incrementally instead of being built in
+    memory first; fields are appended after the list.
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield '{' + dumps(key) + ':['
+        for i, item in enumerate(items):
+            yield (',' if i else '') + dumps(item)
+        yield ']'
+        for name, value in fields.items():
+            yield ',' + dumps(name) + ':' + dumps(value)
+        yield '}'
+
+    return Response(generate(), mimetype='application/json')
+
+
+def _gzip_stream(chunks):
+    """Gzip-compress an iterable of response chunks incrementally."""
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_response(response):
+    """after_request hook gzip-compressing large JSON responses."""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers
+            or 'gzip' not in request.headers.get('Accept-Encoding', '').lower()):
+        return response
+
+    if response.is_streamed:
+        # Size is unknown up front; compress as the body is produced
+        response.response = _gzip_stream(response.response)
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers.pop('Content-Length', None)
+        response.vary.add('Accept-Encoding')
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=COMPRESS_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+
+    # The body bytes changed, so a strong ETag no longer matches them
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+    return response
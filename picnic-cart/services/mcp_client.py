@@ -3,14 +3,115 @@
 import os
 import logging
 import json
-from typing import Dict, Any, Optional, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .cache import get_cache
+from . import fastjson
 
 logger = logging.getLogger(__name__)
 
 MCP_SERVER_URL = os.getenv('MCP_SERVER_URL', 'http://localhost:3000')
 MCP_TIMEOUT = int(os.getenv('MCP_TIMEOUT', '30'))
+# Max concurrent MCP calls issued by a single request
+MCP_MAX_WORKERS = int(os.getenv('MCP_MAX_WORKERS', '8'))
+
+# Max keep-alive connections to the MCP server
+MCP_POOL_SIZE = int(os.getenv('MCP_POOL_SIZE', '20'))
+
+# TTLs (seconds) for caching read-only tool results, keyed by tool name or
+# "tool:filter" for tools whose freshness depends on the filter argument
+MCP_CACHE_TTLS = {
+    'get_categories': 3600,
+    'search_products': 300,
+    'get_order_history:CURRENT': 30,
+}
+
+# The MCP server is bound to a single Picnic account, so its user ID is stable
+PICNIC_USER_ID_CACHE_KEY = 'mcp:user_id'
+PICNIC_USER_ID_CACHE_TTL = 24 * 60 * 60
+
+# Consecutive failures before MCP calls fail fast, and for how long (seconds)
+MCP_BREAKER_FAILURES = int(os.getenv('MCP_BREAKER_FAILURES', '5'))
+MCP_BREAKER_RESET = int(os.getenv('MCP_BREAKER_RESET', '30'))
+
+
+class MCPUnavailableError(Exception):
+    """Raised without contacting the MCP server while its breaker is open."""
+
+
+class CircuitBreaker:
+    """Fail fast while a dependency keeps failing.
+
+    After fail_max consecutive failures the breaker opens and check() raises
+    immediately for reset_timeout seconds. After that a single trial call is
+    let through; its outcome closes the breaker or reopens it.
+    """
+
+    def __init__(self, fail_max: int, reset_timeout: float):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        """Raise MCPUnavailableError if calls should not be attempted."""
+        if self._failures < self.fail_max:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if now < self._retry_at:
+                raise MCPUnavailableError(
+                    f"MCP server unavailable, retrying in {int(self._retry_at - now) + 1}s"
+                )
+            # Let this call through as the trial; hold the others back
+            self._retry_at = now + self.reset_timeout
+
+    def record_success(self) -> None:
+        if self._failures:
+            with self._lock:
+                self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures == self.fail_max:
+                logger.warning(f"MCP server failing, pausing calls for {self.reset_timeout}s")
+            if self._failures >= self.fail_max:
+                self._retry_at = time.monotonic() + self.reset_timeout
+
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+
+def tool_cache_key(tool_name: str, arguments: Optional[Dict] = None) -> str:
+    """Cache key for a tool result, shared by every caller of that tool."""
+    return f"mcp:tool:{tool_name}:{json.dumps(arguments or {}, sort_keys=True)}"
+
+
+def encode_tool_call(tool_name: str, arguments: Optional[Dict] = None) -> bytes:
+    """Encode a /call-tool request body (with orjson when available)."""
+    return fastjson.dumps({"name": tool_name, "arguments": arguments or {}}).encode()
+
+
+def is_server_failure(error: requests.exceptions.RequestException) -> bool:
+    """Whether a request error means the server is down, not a bad call."""
+    response = getattr(error, 'response', None)
+    return response is None or response.status_code >= 500
+
+
+# Shared by every client of the MCP server, including the legacy routes
+mcp_breaker = CircuitBreaker(MCP_BREAKER_FAILURES, MCP_BREAKER_RESET)
+
+# Shared pool for fanning out independent MCP calls
+_executor = ThreadPoolExecutor(max_workers=MCP_MAX_WORKERS, thread_name_prefix='mcp')
 
 
 class MCPClient:
@@ -18,41 +119,104 @@ class MCPClient:
 
     def __init__(self, base_url: str = None):
         self.base_url = base_url or MCP_SERVER_URL
+        # Reuse connections to the MCP server across requests and threads
+        self.session = requests.Session()
+        # Retries cover failed connects, plus GETs on gateway errors
+        # (honouring Retry-After); tool calls are POSTs and aren't re-sent
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max(MCP_POOL_SIZE, MCP_MAX_WORKERS),
+            max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504], raise_on_status=False)
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
     def call_tool(self, tool_name: str, arguments: Dict = None) -> Any:
         """Call an MCP tool and return the result."""
+        mcp_breaker.check()
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/call-tool",
-                json={"name": tool_name, "arguments": arguments or {}},
+                data=encode_tool_call(tool_name, arguments),
+                headers=JSON_HEADERS,
                 timeout=MCP_TIMEOUT
             )
             response.raise_for_status()
+            mcp_breaker.record_success()
 
-            data = response.json()
+            data = fastjson.loads(response.content)
 
             # Extract result from MCP response format
             if 'content' in data and isinstance(data['content'], list):
                 for content in data['content']:
                     if content.get('type') == 'text':
                         try:
-                            return json.loads(content['text'])
+                            return fastjson.loads(content['text'])
                         except json.JSONDecodeError:
                             return content['text']
 
             return data
 
         except requests.exceptions.Timeout:
+            mcp_breaker.record_failure()
             logger.error(f"MCP call timeout: {tool_name}")
             raise Exception("Request timeout")
         except requests.exceptions.RequestException as e:
+            if is_server_failure(e):
+                mcp_breaker.record_failure()
             logger.error(f"MCP call error: {tool_name} - {e}")
             raise Exception(f"MCP server error: {e}")
 
+    def call_tool_cached(self, tool_name: str, arguments: Dict = None) -> Any:
+        """Call an MCP tool, reusing a recent result if the tool is cacheable.
+
+        Tools without an entry in MCP_CACHE_TTLS are always called.
+        """
+        arguments = arguments or {}
+        ttl = MCP_CACHE_TTLS.get(
+            f"{tool_name}:{arguments['filter']}" if 'filter' in arguments else tool_name
+        )
+        if not ttl:
+            return self.call_tool(tool_name, arguments)
+
+        # Concurrent callers of the same tool share one round trip
+        result, _ = get_cache().get_or_load(
+            tool_cache_key(tool_name, arguments),
+            lambda: self.call_tool(tool_name, arguments),
+            ttl,
+            keep_stale=False
+        )
+        return result
+
+    def call_tools(
+        self,
+        calls: List[Tuple[str, Optional[Dict]]],
+        use_cache: bool = False
+    ) -> List[Any]:
+        """Call several independent MCP tools concurrently.
+
+        Returns results in the same order as calls. A call that failed has
+        its exception in place of the result, so one failure does not
+        discard the others. With use_cache, cacheable tools go through
+        call_tool_cached.
+        """
+        call = self.call_tool_cached if use_cache else self.call_tool
+        futures = [
+            _executor.submit(call, name, arguments)
+            for name, arguments in calls
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
     def health_check(self) -> bool:
         """Check if MCP server is healthy."""
         try:
-            response = requests.get(f"{self.base_url}/health", timeout=5)
+            response = self.session.get(f"{self.base_url}/health", timeout=5)
             return response.status_code == 200
         except:
             return False
@@ -61,13 +225,19 @@ class MCPClient:
     # Product Operations
     # ========================================================================
 
-    def search_products(self, query: str) -> List[Dict]:
+    def search_products(self, query: str, use_cache: bool = False) -> List[Dict]:
         """Search for products."""
-        return self.call_tool('search_products', {'query': query})
+        call = self.call_tool_cached if use_cache else self.call_tool
+        return call('search_products', {'query': normalize_query(query)})
 
-    def get_categories(self) -> List[Dict]:
+    def get_product_details(self, product_id: str) -> Optional[Dict]:
+        """Get a single product by ID (None if unknown)."""
+        return self.call_tool('get_product_details', {'productId': product_id})
+
+    def get_categories(self, use_cache: bool = False) -> List[Dict]:
         """Get product categories."""
-        return self.call_tool('get_categories')
+        call = self.call_tool_cached if use_cache else self.call_tool
+        return call('get_categories')
 
     # ========================================================================
     # Cart Operations
@@ -110,12 +280,14 @@ class MCPClient:
     def get_order_history(
         self,
         filter: str = 'COMPLETED',
-        limit: int = 50
+        limit: int = 50,
+        offset: int = 0
     ) -> Dict:
-        """Get order history."""
+        """Get a page of order history."""
         return self.call_tool('get_order_history', {
             'filter': filter,
-            'limit': limit
+            'limit': limit,
+            'offset': offset
         })
 
     def search_orders(
@@ -142,6 +314,31 @@ class MCPClient:
         return self.call_tool('get_lists')
 
 
+def normalize_query(query: str) -> str:
+    """Canonical form of a product search query.
+
+    Picnic's search ignores case and extra whitespace, so differently typed
+    versions of the same query share one cached result.
+    """
+    return ' '.join(query.split()).lower()
+
+
+def extract_list(result: Any, *keys: str) -> List:
+    """Get the list from a tool result that is either a bare list or a dict.
+
+    For dicts, the first of keys holding a list wins. Anything else yields
+    an empty list.
+    """
+    if isinstance(result, list):
+        return result
+    if isinstance(result, dict):
+        for key in keys:
+            value = result.get(key)
+            if isinstance(value, list):
+                return value
+    return []
+
+
 # Global instance
 _mcp_client = None
 
@@ -152,3 +349,21 @@ def get_mcp_client() -> MCPClient:
     if _mcp_client is None:
         _mcp_client = MCPClient()
     return _mcp_client
+
+
+def get_picnic_user_id() -> str:
+    """Get the Picnic user ID, asking the MCP server only on a cache miss."""
+    cache = get_cache()
+    picnic_user_id = cache.get(PICNIC_USER_ID_CACHE_KEY)
+    if picnic_user_id:
+        return picnic_user_id
+
+    try:
+        user_data = get_mcp_client().get_user()
+        picnic_user_id = user_data.get('user_id') or user_data.get('id') or 'default'
+    except Exception:
+        # If MCP is not available, use a default ID
+        return 'default-user'
+
+    cache.set(PICNIC_USER_ID_CACHE_KEY, picnic_user_id, PICNIC_USER_ID_CACHE_TTL)
+    return picnic_user_id
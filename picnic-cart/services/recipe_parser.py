@@ -3,7 +3,6 @@
 import os
 import re
 import logging
-import json
 from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
 
@@ -11,6 +10,7 @@ import requests
 from bs4 import BeautifulSoup
 
 from .mcp_client import get_mcp_client
+from . import fastjson
 
 logger = logging.getLogger(__name__)
 
@@ -90,12 +90,14 @@ class RecipeParserService:
 
     def __init__(self):
         self.mcp_client = get_mcp_client()
+        # Reuse connections for page fetches and Home Assistant calls
+        self.session = requests.Session()
 
     def parse_url(self, url: str) -> Dict[str, Any]:
         """Parse a recipe from a URL."""
         try:
             # Fetch the page
-            response = requests.get(url, timeout=10, headers={
+            response = self.session.get(url, timeout=10, headers={
                 'User-Agent': 'Mozilla/5.0 (compatible; PicnicRecipeParser/1.0)'
             })
             response.raise_for_status()
@@ -160,23 +162,17 @@ class RecipeParserService:
         not_found: List[Dict] = []
         needs_review: List[int] = []  # Indices of matches needing user review
 
-        for ingredient in ingredients:
-            name = ingredient.get('name', '')
-            if not name:
-                continue
+        ingredients_to_match = [ing for ing in ingredients if ing.get('name', '')]
 
-            # Get normalized search terms
-            search_terms = self._get_search_terms(name)
-            all_results = []
+        # Search with multiple normalized terms per ingredient to get better
+        # coverage (limit to 3 search attempts), all searches running at once
+        search_results = self._search_concurrently([
+            self._get_search_terms(ing['name'])[:3]
+            for ing in ingredients_to_match
+        ])
 
-            # Search with multiple terms to get better coverage
-            for term in search_terms[:3]:  # Limit to 3 search attempts
-                try:
-                    results = self.mcp_client.search_products(term)
-                    if results:
-                        all_results.extend(results)
-                except Exception as e:
-                    logger.warning(f"Search failed for term '{term}': {e}")
+        for ingredient, all_results in zip(ingredients_to_match, search_results):
+            name = ingredient['name']
 
             if all_results:
                 # Remove duplicates and score all results
@@ -255,6 +251,32 @@ class RecipeParserService:
 
         return result
 
+    def _search_concurrently(self, term_lists: List[List[str]]) -> List[List[Dict]]:
+        """Run the product searches for several term lists in parallel.
+
+        Each distinct term is searched once, however many ingredients share
+        it. Returns the combined search results for each term list, in order.
+        """
+        unique_terms = list(dict.fromkeys(
+            term.strip().lower() for terms in term_lists for term in terms
+        ))
+        results_by_term = dict(zip(unique_terms, self.mcp_client.call_tools(
+            [('search_products', {'query': term}) for term in unique_terms],
+            use_cache=True
+        )))
+
+        combined = []
+        for terms in term_lists:
+            all_results = []
+            for term in terms:
+                result = results_by_term[term.strip().lower()]
+                if isinstance(result, Exception):
+                    logger.warning(f"Search failed for term '{term}': {result}")
+                elif result:
+                    all_results.extend(result)
+            combined.append(all_results)
+        return combined
+
     def _get_search_terms(self, ingredient_name: str) -> List[str]:
         """Generate multiple search terms for an ingredient."""
         terms = []
@@ -359,7 +381,7 @@ class RecipeParserService:
         recipe_schema = soup.find('script', type='application/ld+json')
         if recipe_schema:
             try:
-                data = json.loads(recipe_schema.string)
+                data = fastjson.loads(recipe_schema.string)
                 if isinstance(data, dict) and data.get('@type') == 'Recipe':
                     return data.get('name', '')
                 if isinstance(data, list):
@@ -389,7 +411,7 @@ class RecipeParserService:
         recipe_schema = soup.find('script', type='application/ld+json')
         if recipe_schema:
             try:
-                data = json.loads(recipe_schema.string)
+                data = fastjson.loads(recipe_schema.string)
                 if isinstance(data, dict) and data.get('@type') == 'Recipe':
                     return data.get('recipeIngredient', [])
                 if isinstance(data, list):
@@ -506,7 +528,7 @@ Return as JSON array. Only include food ingredients, not equipment or utensils.
 Recipe text:
 {text[:3000]}"""
 
-            response = requests.post(
+            response = self.session.post(
                 f"{HA_URL}/api/conversation/process",
                 headers={
                     'Authorization': f'Bearer {HA_TOKEN}',
@@ -520,13 +542,13 @@ Recipe text:
             )
 
             if response.status_code == 200:
-                data = response.json()
+                data = fastjson.loads(response.content)
                 speech = data.get('response', {}).get('speech', {}).get('plain', {}).get('speech', '')
 
                 # Try to parse JSON from the response
                 json_match = re.search(r'\[[\s\S]*\]', speech)
                 if json_match:
-                    ingredients_data = json.loads(json_match.group())
+                    ingredients_data = fastjson.loads(json_match.group())
                     return [
                         ParsedIngredient(
                             name=item.get('name', ''),
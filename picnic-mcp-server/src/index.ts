@@ -7,7 +7,7 @@
 import { MCP, registerTool } from './mcp';
 import { PicnicClient, Product } from './picnic-client';
 import { MemoryCache } from './cache';
-import { object, string, number, optional } from 'zod';
+import { object, string, number, optional, array } from 'zod';
 
 // --- Types ---
 
@@ -99,6 +99,30 @@ class PicnicMCP extends MCP {
     return this.picnic.getCart();
   }
 
+  @registerTool({
+    name: 'bulk_add_to_cart',
+    description: 'Add multiple products to the cart in one call. Returns per-item results and the updated cart.',
+    inputSchema: object({
+      items: array(object({
+        productId: string().describe('The ID of the product to add.'),
+        count: number().default(1).describe('The number of items to add.'),
+      })).describe('The products to add.'),
+    }),
+  })
+  async bulkAddToCart({ items }: { items: { productId: string; count: number }[] }) {
+    console.log('Tool: bulk_add_to_cart', { count: items.length });
+    const results = [];
+    for (const { productId, count } of items) {
+      try {
+        await this.picnic.addProductToCart(productId, count);
+        results.push({ productId, count, success: true });
+      } catch (error: any) {
+        results.push({ productId, count, success: false, error: error?.message || String(error) });
+      }
+    }
+    return { results, cart: await this.picnic.getCart() };
+  }
+
   @registerTool({
     name: 'search_products',
     description: 'Search for products in the Picnic catalog.',
@@ -195,7 +219,12 @@ class PicnicMCP extends MCP {
     offset?: number;
   }) {
     console.log('Tool: get_order_history', { filter, limit, offset });
-    let deliveries = [...(await this.getPastDeliveries()), ...(await this.getUpcomingDeliveries())];
+    // Past deliveries are COMPLETED and upcoming ones CURRENT, so a filter
+    // only needs one of the two lists
+    let deliveries = [
+      ...(filter !== 'CURRENT' ? await this.getPastDeliveries() : []),
+      ...(filter !== 'COMPLETED' ? await this.getUpcomingDeliveries() : []),
+    ];
 
     if (filter) {
       deliveries = deliveries.filter(d => d.status === filter);